@@ -1,14 +1,18 @@
 import os
 
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
 
 from app.utils.formatting import format_currency_br, format_decimal_br
+from app.utils.json_provider import OrjsonProvider, orjson
 from sqlalchemy import inspect, text
+from werkzeug.security import generate_password_hash
 
 from app.migrations import run_all_migrations
+from app.migrations.schema_version import SCHEMA_VERSION, get_schema_version, set_schema_version
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -16,6 +20,8 @@ login_manager = LoginManager()
 def create_app():
     app = Flask(__name__, instance_relative_config=True)
     app.config.from_object(Config)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Inicializar extensões
@@ -37,63 +43,105 @@ def create_app():
     app.jinja_env.filters['currency_br'] = format_currency_br
     app.jinja_env.filters['decimal_br'] = format_decimal_br
 
-    # Criar tabelas do banco de dados
-    with app.app_context():
-        db.create_all()
-        # Criar usuário admin padrão se não existir
-        from app.models import User, Marketplace
-        inspector = inspect(db.engine)
-        user_columns = {col['name'] for col in inspector.get_columns('user')}
-        if 'logo_filename' not in user_columns:
-            try:
+    @app.cli.command('init-db')
+    def init_db():
+        """Cria as tabelas, aplica migrações e insere os dados padrão."""
+        bootstrap_database()
+        click.echo('Banco de dados inicializado.')
+
+    # Em desenvolvimento o bootstrap continua automático; em produção use
+    # AUTO_INIT_DB=0 e rode `flask init-db` uma única vez no deploy.
+    if app.config.get('AUTO_INIT_DB'):
+        with app.app_context():
+            bootstrap_database()
+
+    return app
+
+
+def _reflect_column_names(table_names):
+    """Retorna os nomes de colunas de cada tabela, em uma única reflexão quando possível."""
+    inspector = inspect(db.session.connection())
+    get_multi_columns = getattr(inspector, 'get_multi_columns', None)
+    if get_multi_columns is None:
+        return [
+            {col['name'] for col in inspector.get_columns(table_name)}
+            for table_name in table_names
+        ]
+    reflected = get_multi_columns(filter_names=list(table_names))
+    columns_by_table = {
+        table_name: {col['name'] for col in columns}
+        for (_, table_name), columns in reflected.items()
+    }
+    return [columns_by_table.get(table_name, set()) for table_name in table_names]
+
+
+def bootstrap_database():
+    """
+    Cria as tabelas do banco de dados e insere os registros padrão.
+    Migrações e seed rodam em uma única transação: qualquer erro desfaz
+    tudo, evitando um banco parcialmente migrado.
+    """
+    db.create_all()
+    from app.models import User, Marketplace, Sale
+    try:
+        # Reflexão de colunas, ALTERs e migrações só rodam em bancos com versão antiga.
+        needs_upgrade = get_schema_version(db) < SCHEMA_VERSION
+        if needs_upgrade:
+            user_columns, sale_columns = _reflect_column_names(('user', 'sale'))
+            if 'logo_filename' not in user_columns:
                 db.session.execute(text('ALTER TABLE user ADD COLUMN logo_filename VARCHAR(255)'))
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
-        if not User.query.filter_by(username='admin').first():
-            admin = User(username='admin', email='admin@example.com', role='manager')
-            admin.set_password('admin123')
-            db.session.add(admin)
-            db.session.commit()
-
-        if not User.query.filter_by(username='user').first():
-            user = User(username='user', email='user@example.com', role='user')
-            user.set_password('user123')
-            db.session.add(user)
-            db.session.commit()
-
-        sale_columns = {col['name'] for col in inspector.get_columns('sale')}
-        if 'company_id' not in sale_columns:
-            try:
+            if 'company_id' not in sale_columns:
                 db.session.execute(text('ALTER TABLE sale ADD COLUMN company_id INTEGER'))
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
-            else:
-                sale_columns.add('company_id')
-
-        if 'company_id' in sale_columns:
-            default_company = (
-                User.query.filter_by(role='user')
-                .order_by(User.id.asc())
-                .first()
+            if 'sale_hash' not in sale_columns:
+                hash_type = Sale.__table__.c.sale_hash.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f'ALTER TABLE sale ADD COLUMN sale_hash {hash_type}'))
+            db.session.execute(
+                text(
+                    'UPDATE sale SET company_id = (SELECT MIN(id) FROM user WHERE role = :role) '
+                    'WHERE company_id IS NULL'
+                ),
+                {'role': 'user'},
             )
-            if default_company:
-                try:
-                    db.session.execute(
-                        text('UPDATE sale SET company_id = :company_id WHERE company_id IS NULL'),
-                        {'company_id': default_company.id},
-                    )
-                    db.session.commit()
-                except Exception:
-                    db.session.rollback()
 
-        default_marketplaces = ['Mercado Livre', 'Shopee', 'Amazon', 'Magalu']
-        for marketplace_name in default_marketplaces:
-            if not Marketplace.query.filter_by(nome=marketplace_name).first():
-                db.session.add(Marketplace(nome=marketplace_name))
-        db.session.commit()
+        # Criar usuários padrão se não existirem
+        default_users = [
+            {'username': 'admin', 'email': 'admin@example.com', 'role': 'manager', 'password': 'admin123'},
+            {'username': 'user', 'email': 'user@example.com', 'role': 'user', 'password': 'user123'},
+        ]
+        existing_users = {
+            username
+            for (username,) in db.session.query(User.username).filter(
+                User.username.in_([entry['username'] for entry in default_users])
+            )
+        }
+        db.session.bulk_insert_mappings(User, [
+            {
+                'username': entry['username'],
+                'email': entry['email'],
+                'role': entry['role'],
+                'password_hash': generate_password_hash(entry['password']),
+            }
+            for entry in default_users
+            if entry['username'] not in existing_users
+        ])
 
-        run_all_migrations(db)
+        default_marketplaces = ['Mercado Livre', 'Shopee', 'Amazon', 'Magalu']
+        existing_marketplaces = {
+            nome
+            for (nome,) in db.session.query(Marketplace.nome).filter(
+                Marketplace.nome.in_(default_marketplaces)
+            )
+        }
+        db.session.bulk_insert_mappings(Marketplace, [
+            {'nome': marketplace_name}
+            for marketplace_name in default_marketplaces
+            if marketplace_name not in existing_marketplaces
+        ])
 
-    return app
+        if needs_upgrade:
+            run_all_migrations(db)
+            set_schema_version(db, SCHEMA_VERSION)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
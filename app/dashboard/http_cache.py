@@ -0,0 +1,86 @@
+"""Validação condicional (ETag/304) para as telas somente leitura do dashboard."""
+
+import hashlib
+import os
+from datetime import date
+from functools import lru_cache, wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+from app import db
+from app.models import CompanyDataBoundary
+from app.services.bootstrap import get_bootstrap_signature
+
+
+@lru_cache(maxsize=1)
+def _templates_stamp(template_folder: str) -> int:
+    # Um deploy com templates novos muda o ETag mesmo sem dados novos.
+    latest = 0
+    for root, _, files in os.walk(template_folder):
+        for name in files:
+            latest = max(latest, int(os.path.getmtime(os.path.join(root, name))))
+    return latest
+
+
+def _data_version(user) -> str:
+    """
+    Versão dos dados visíveis na tela: as linhas de company_data_boundaries
+    (updated_at muda a cada importação, remoção de empresa ou venda gravada
+    pelo ORM) da empresa do usuário ou, para gestores, da empresa filtrada.
+    """
+    company_id = request.args.get('company_id', type=int) if user.is_manager() else user.id
+    query = db.session.query(
+        CompanyDataBoundary.company_id,
+        CompanyDataBoundary.marketplace_id,
+        CompanyDataBoundary.updated_at,
+    )
+    if company_id:
+        query = query.filter(CompanyDataBoundary.company_id == company_id)
+    rows = query.order_by(CompanyDataBoundary.company_id, CompanyDataBoundary.marketplace_id).all()
+    return ';'.join(f'{company}:{marketplace}:{updated_at}' for company, marketplace, updated_at in rows)
+
+
+def _dashboard_etag(user) -> str:
+    template_folder = os.path.join(current_app.root_path, current_app.template_folder or 'templates')
+    key = '|'.join(str(part) for part in (
+        request.endpoint,
+        user.id,
+        user.role,
+        request.query_string.decode('latin-1'),
+        # Filtros sem data usam o mês mais recente ou os últimos 30 dias.
+        date.today().isoformat(),
+        _data_version(user),
+        get_bootstrap_signature(),
+        _templates_stamp(template_folder),
+    ))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_dashboard(view):
+    """
+    Responde 304 quando o navegador já possui a renderização para os mesmos
+    filtros e nenhuma venda foi gravada desde então. A chave combina endpoint,
+    usuário, query string, data atual, a versão dos dados da empresa (ver
+    _data_version) e as listas de marketplaces/empresas.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Mensagens flash pendentes precisam ser renderizadas.
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        user = current_user._get_current_object()
+        etag = _dashboard_etag(user)
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return wrapper
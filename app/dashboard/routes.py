@@ -1,38 +1,59 @@
 import os
-from datetime import date, datetime, timedelta
+import shutil
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 from uuid import uuid4
 
-from flask import current_app, flash, redirect, render_template, request, url_for
+from flask import (
+    current_app,
+    flash,
+    g,
+    get_flashed_messages,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    stream_template,
+    url_for,
+)
 from flask_login import current_user, login_required
+from sqlalchemy import or_
 
 from app import db
 from app.dashboard import dashboard_bp
-from app.models import ManagerNote, Marketplace, User
+from app.dashboard.http_cache import conditional_dashboard
+from app.models import ManagerNote, User
+from app.services.bootstrap import get_marketplaces, get_user_companies
 from app.services.metrics import (
     abc_by_revenue,
     calculate_rfm_analysis,
     cohort_analysis,
+    get_dashboard_bundle,
     get_data_boundaries,
     get_kpis,
     get_most_recent_month_range,
+    invalidate_data_boundaries,
     monthly_growth_analysis,
     monthly_revenue_totals,
     monthly_sales_counts,
     pareto_analysis,
     products_by_price_range,
+    rebuild_data_boundaries,
     sales_by_city,
     sales_by_day_of_week,
     sales_by_hour_of_day,
     sales_by_shipping_method,
     sales_by_state,
-    sales_timeseries,
     sales_with_moving_average,
     shipping_performance,
     status_breakdown,
+    status_breakdown_with_previous,
     top_products_by_revenue,
     top_products_with_margin,
 )
 from app.utils.formatting import format_currency_br, format_decimal_br
+from app.utils.sql import dialect_insert
 from werkzeug.utils import secure_filename
 
 
@@ -42,25 +63,46 @@ def _redirect_to_role_dashboard():
     return redirect(url_for('dashboard.user_dashboard'))
 
 
+@dashboard_bp.context_processor
+def inject_marketplaces():
+    return {'marketplaces': get_marketplaces()}
+
+
 def _parse_date(value):
-    if not value:
+    # Só aceita YYYY-MM-DD; fromisoformat (em C) também aceitaria 20250101 ou 2025-W01-1.
+    if not value or len(value) != 10 or value[4] != '-' or value[7] != '-':
         return None
     try:
-        return datetime.strptime(value, '%Y-%m-%d').date()
+        return date.fromisoformat(value)
     except (TypeError, ValueError):
         return None
 
 
+def _parse_positive_int(value):
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
 
 def _get_filters_from_request():
-    source = request.values if request.method == 'POST' else request.args
-    start_raw = source.get('start_date')
-    end_raw = source.get('end_date')
-    marketplace_id = source.get('marketplace_id', type=int)
-    company_id = source.get('company_id', type=int)
+    # O formulário da nota do gestor envia todos os filtros no corpo do POST.
+    source = request.form if request.method == 'POST' else request.args
+    return parse_filters(
+        source.get('start_date'),
+        source.get('end_date'),
+        source.get('marketplace_id'),
+        source.get('company_id'),
+    )
+
 
-    marketplace_id = marketplace_id if marketplace_id and marketplace_id > 0 else None
-    company_id = company_id if company_id and company_id > 0 else None
+def parse_filters(start_raw, end_raw, marketplace_raw=None, company_raw=None):
+    """Converte os valores brutos dos filtros em (início, fim, marketplace_id, company_id)."""
+    marketplace_id = _parse_positive_int(marketplace_raw)
+    company_id = _parse_positive_int(company_raw)
 
     # Se ambas as datas foram fornecidas, use-as
     if start_raw and end_raw:
@@ -109,45 +151,103 @@ def _build_redirect_params(start_date, end_date, marketplace_id, company_id=None
     return params
 
 
+def _resolve_company_filter(company_id):
+    if current_user.is_manager():
+        companies = get_user_companies()
+        company_ids = [company.id for company in companies]
+        if company_id not in company_ids and company_ids:
+            company_id = company_ids[0]
+    else:
+        company_id = current_user.id
+        companies = []
+    return companies, company_id
+
+
+def _dashboard_filters():
+    """
+    Filtros da request já com a empresa validada, no formato
+    (início, fim, marketplace_id, company_id, empresas). Calculado uma única
+    vez por request e guardado em g.
+    """
+    filters = getattr(g, 'dashboard_filters', None)
+    if filters is None:
+        start_date, end_date, marketplace_id, company_id = _get_filters_from_request()
+        companies, company_id = _resolve_company_filter(company_id)
+        filters = g.dashboard_filters = (start_date, end_date, marketplace_id, company_id, companies)
+    return filters
+
+
+def _load_dashboard_bundle(session, start_date, end_date, marketplace_id, company_id, abc_limit):
+    """
+    Bundle do painel principal como (início, fim, início anterior, fim anterior, bundle).
+    Sem pedidos válidos no período, refaz o bundle sobre o intervalo com dados
+    disponíveis; a checagem usa os KPIs do próprio bundle, sem consulta extra.
+    """
+    previous_start, previous_end = _get_previous_period(start_date, end_date)
+    bundle = get_dashboard_bundle(
+        session, start_date, end_date, previous_start, previous_end,
+        marketplace_id, company_id, abc_limit=abc_limit,
+    )
+    if not bundle['kpis']['pedidos_totais']:
+        min_date, max_date = get_data_boundaries(session, marketplace_id, company_id)
+        if min_date and max_date:
+            if min_date > max_date:
+                min_date, max_date = max_date, min_date
+            if min_date != start_date or max_date != end_date:
+                start_date, end_date = min_date, max_date
+                previous_start, previous_end = _get_previous_period(start_date, end_date)
+                bundle = get_dashboard_bundle(
+                    session, start_date, end_date, previous_start, previous_end,
+                    marketplace_id, company_id, abc_limit=abc_limit,
+                )
+    return start_date, end_date, previous_start, previous_end, bundle
+
+
+_VARIATION_UP = 'aumento de %s%% em relação ao período anterior'
+_VARIATION_DOWN = 'queda de %s%% em relação ao período anterior'
+_VARIATION_FLAT = 'estabilidade em relação ao período anterior'
+_VARIATION_FROM_ZERO = 'crescimento sobre um período sem registros'
+_VARIATION_NONE = 'sem variação em relação ao período anterior'
+
+_INSIGHT_REVENUE = 'Faturamento do período: %s (%s).'
+_INSIGHT_ORDERS = 'Total de pedidos válidos: %s (%s).'
+_INSIGHT_CANCELLATION = 'Taxa de cancelamento em %s%% no período analisado.'
+_INSIGHT_NO_CANCELLATION = 'Nenhum pedido cancelado no período selecionado.'
+_INSIGHT_TOP_SKU = 'SKU de maior faturamento: %s com %s%% do total (classe %s).'
+
+
 def _variation_text(current_value, previous_value):
     if previous_value:
         variation = ((current_value - previous_value) / previous_value) * 100
         if variation > 0:
-            return (
-                f"aumento de {format_decimal_br(variation, 1)}% em relação ao período anterior"
-            )
+            return _VARIATION_UP % format_decimal_br(variation, 1)
         if variation < 0:
-            return (
-                f"queda de {format_decimal_br(abs(variation), 1)}% em relação ao período anterior"
-            )
-        return 'estabilidade em relação ao período anterior'
+            return _VARIATION_DOWN % format_decimal_br(abs(variation), 1)
+        return _VARIATION_FLAT
     if current_value > 0:
-        return 'crescimento sobre um período sem registros'
-    return 'sem variação em relação ao período anterior'
+        return _VARIATION_FROM_ZERO
+    return _VARIATION_NONE
 
 
 def _generate_insights(kpis, previous_kpis, abc_data):
-    insights = []
-    insights.append(
-        f"Faturamento do período: {format_currency_br(kpis['faturamento'])} ("
-        f"{_variation_text(kpis['faturamento'], previous_kpis['faturamento'])})."
-    )
-    insights.append(
-        "Total de pedidos válidos: "
-        f"{format_decimal_br(kpis['pedidos_totais'], 0)} ("
-        f"{_variation_text(kpis['pedidos_totais'], previous_kpis['pedidos_totais'])})."
-    )
+    insights = [
+        _INSIGHT_REVENUE % (
+            format_currency_br(kpis['faturamento']),
+            _variation_text(kpis['faturamento'], previous_kpis['faturamento']),
+        ),
+        _INSIGHT_ORDERS % (
+            format_decimal_br(kpis['pedidos_totais'], 0),
+            _variation_text(kpis['pedidos_totais'], previous_kpis['pedidos_totais']),
+        ),
+    ]
     if kpis['taxa_cancelamento'] > 0:
-        insights.append(
-            f"Taxa de cancelamento em {format_decimal_br(kpis['taxa_cancelamento'], 1)}% no período analisado."
-        )
+        insights.append(_INSIGHT_CANCELLATION % format_decimal_br(kpis['taxa_cancelamento'], 1))
     else:
-        insights.append('Nenhum pedido cancelado no período selecionado.')
+        insights.append(_INSIGHT_NO_CANCELLATION)
     if abc_data:
         top = abc_data[0]
         insights.append(
-            "SKU de maior faturamento: "
-            f"{top['sku']} com {format_decimal_br(top['percentual'], 1)}% do total (classe {top['classe']})."
+            _INSIGHT_TOP_SKU % (top['sku'], format_decimal_br(top['percentual'], 1), top['classe'])
         )
     return insights
 
@@ -155,9 +255,8 @@ def _generate_insights(kpis, previous_kpis, abc_data):
 def _allowed_logo(filename):
     if not filename or '.' not in filename:
         return False
-    allowed = current_app.config.get('ALLOWED_LOGO_EXTENSIONS', {'png', 'jpg', 'jpeg', 'gif', 'webp'})
     extension = filename.rsplit('.', 1)[1].lower()
-    return extension in allowed
+    return extension in current_app.config['ALLOWED_LOGO_EXTENSIONS']
 
 
 def _remove_logo_file(filename):
@@ -174,6 +273,9 @@ def _remove_logo_file(filename):
         pass
 
 
+LOGO_COPY_BUFFER_SIZE = 1024 * 1024
+
+
 def _save_logo_file(storage, previous=None):
     if not storage or not storage.filename:
         return previous
@@ -186,12 +288,27 @@ def _save_logo_file(storage, previous=None):
     os.makedirs(upload_folder, exist_ok=True)
     filepath = os.path.join(upload_folder, unique_name)
     storage.stream.seek(0)
-    storage.save(filepath)
+    with open(filepath, 'wb') as destination:
+        shutil.copyfileobj(storage.stream, destination, LOGO_COPY_BUFFER_SIZE)
     if previous and previous != unique_name:
         _remove_logo_file(previous)
     return unique_name
 
 
+CompanyRow = namedtuple('CompanyRow', 'id username email logo_filename')
+
+
+def _list_user_companies():
+    """Empresas para a tela de gestão, carregando só as colunas exibidas."""
+    rows = (
+        db.session.query(User.id, User.username, User.email, User.logo_filename)
+        .filter(User.role == 'user')
+        .order_by(User.username.asc())
+        .all()
+    )
+    return [CompanyRow(*row) for row in rows]
+
+
 @dashboard_bp.route('/')
 def dashboard_index():
     if current_user.is_authenticated:
@@ -202,6 +319,7 @@ def dashboard_index():
 @dashboard_bp.route('/companies', methods=['GET', 'POST'])
 @login_required
 def manage_companies():
+    session = db.session()
     if not current_user.is_manager():
         return _redirect_to_role_dashboard()
 
@@ -222,12 +340,19 @@ def manage_companies():
                 errors.append('A senha deve conter ao menos 6 caracteres.')
             if password != confirm_password:
                 errors.append('A confirmação da senha não confere.')
-            if username and User.query.filter_by(username=username).first():
-                errors.append('Já existe uma empresa com esse nome de usuário.')
-            if email and User.query.filter_by(email=email).first():
-                errors.append('Já existe uma empresa utilizando esse e-mail.')
             if pending_logo and pending_logo.filename and not _allowed_logo(pending_logo.filename):
                 errors.append('Formato de logotipo inválido. Utilize PNG, JPG, JPEG, GIF ou WEBP.')
+            # Só consulta o banco quando os campos já passaram nas validações locais.
+            if not errors:
+                conflicts = (
+                    session.query(User.username, User.email)
+                    .filter(or_(User.username == username, User.email == email))
+                    .all()
+                )
+                if any(row.username == username for row in conflicts):
+                    errors.append('Já existe uma empresa com esse nome de usuário.')
+                if any(row.email == email for row in conflicts):
+                    errors.append('Já existe uma empresa utilizando esse e-mail.')
 
             if errors:
                 for message in errors:
@@ -243,49 +368,55 @@ def manage_companies():
                     logo_filename=logo_filename,
                 )
                 new_user.set_password(password)
-                db.session.add(new_user)
-                db.session.commit()
+                session.add(new_user)
+                session.commit()
                 flash('Empresa cadastrada com sucesso.', 'success')
 
         elif action == 'password':
             user_id = request.form.get('user_id', type=int)
             new_password = request.form.get('new_password') or ''
             confirm_password = request.form.get('confirm_password') or ''
-            company = User.query.filter_by(id=user_id, role='user').first()
 
-            if not company:
+            errors = []
+            if not new_password:
+                errors.append('Informe a nova senha.')
+            if new_password and len(new_password) < 6:
+                errors.append('A nova senha deve conter ao menos 6 caracteres.')
+            if new_password != confirm_password:
+                errors.append('A confirmação da senha não confere.')
+
+            company = None
+            if user_id and not errors:
+                company = User.query.filter_by(id=user_id, role='user').first()
+
+            if errors:
+                for message in errors:
+                    flash(message, 'error')
+            elif not company:
                 flash('Empresa não encontrada.', 'error')
             else:
-                errors = []
-                if not new_password:
-                    errors.append('Informe a nova senha.')
-                if new_password and len(new_password) < 6:
-                    errors.append('A nova senha deve conter ao menos 6 caracteres.')
-                if new_password != confirm_password:
-                    errors.append('A confirmação da senha não confere.')
-
-                if errors:
-                    for message in errors:
-                        flash(message, 'error')
-                else:
-                    company.set_password(new_password)
-                    db.session.commit()
-                    flash('Senha atualizada com sucesso.', 'success')
+                company.set_password(new_password)
+                session.commit()
+                flash('Senha atualizada com sucesso.', 'success')
 
         elif action == 'logo':
             user_id = request.form.get('user_id', type=int)
-            company = User.query.filter_by(id=user_id, role='user').first()
             logo_file = request.files.get('logo')
+            has_logo = bool(logo_file and logo_file.filename)
 
-            if not company:
-                flash('Empresa não encontrada.', 'error')
-            elif not logo_file or not logo_file.filename:
+            company = None
+            if user_id and has_logo and _allowed_logo(logo_file.filename):
+                company = User.query.filter_by(id=user_id, role='user').first()
+
+            if not has_logo:
                 flash('Selecione um arquivo de logotipo para enviar.', 'error')
             elif not _allowed_logo(logo_file.filename):
                 flash('Formato de logotipo inválido. Utilize PNG, JPG, JPEG, GIF ou WEBP.', 'error')
+            elif not company:
+                flash('Empresa não encontrada.', 'error')
             else:
                 company.logo_filename = _save_logo_file(logo_file, previous=company.logo_filename)
-                db.session.commit()
+                session.commit()
                 flash('Logotipo atualizado com sucesso.', 'success')
 
         elif action == 'delete':
@@ -295,19 +426,18 @@ def manage_companies():
                 flash('Empresa não encontrada.', 'error')
             else:
                 _remove_logo_file(company.logo_filename)
-                db.session.delete(company)
-                db.session.commit()
+                session.delete(company)
+                session.flush()
+                rebuild_data_boundaries(session)
+                session.commit()
+                invalidate_data_boundaries()
                 flash('Empresa removida com sucesso.', 'success')
 
         return redirect(url_for('dashboard.manage_companies'))
 
-    companies = (
-        User.query.filter_by(role='user')
-        .order_by(User.username.asc())
-        .all()
-    )
+    companies = _list_user_companies()
 
-    allowed_extensions = ', '.join(sorted(current_app.config.get('ALLOWED_LOGO_EXTENSIONS', [])))
+    allowed_extensions = ', '.join(sorted(current_app.config['ALLOWED_LOGO_EXTENSIONS']))
 
     return render_template(
         'dashboard_companies.html',
@@ -316,24 +446,60 @@ def manage_companies():
     )
 
 
+def _save_manager_note(session, author_id, start_date, end_date, company_id, content):
+    """Grava a nota do período em um único INSERT ... ON CONFLICT DO UPDATE quando suportado."""
+    insert = dialect_insert(session)
+    if insert is not None:
+        stmt = insert(ManagerNote).values(
+            periodo_inicio=start_date,
+            periodo_fim=end_date,
+            conteudo=content,
+            author_id=author_id,
+            company_id=company_id,
+        )
+        conflict_columns = [ManagerNote.author_id, ManagerNote.periodo_inicio, ManagerNote.periodo_fim]
+        if company_id is None:
+            # Notas sem empresa usam o índice único parcial (company_id IS NULL).
+            conflict = {'index_elements': conflict_columns, 'index_where': ManagerNote.company_id.is_(None)}
+        else:
+            conflict = {'index_elements': conflict_columns + [ManagerNote.company_id]}
+        session.execute(
+            stmt.on_conflict_do_update(set_={'conteudo': stmt.excluded.conteudo}, **conflict)
+        )
+        return
+
+    note = ManagerNote.query.filter_by(
+        author_id=author_id,
+        periodo_inicio=start_date,
+        periodo_fim=end_date,
+        company_id=company_id,
+    ).first()
+    if note:
+        note.conteudo = content
+    else:
+        session.add(ManagerNote(
+            periodo_inicio=start_date,
+            periodo_fim=end_date,
+            conteudo=content,
+            author_id=author_id,
+            company_id=company_id,
+        ))
+
+
 @dashboard_bp.route('/manager', methods=['GET', 'POST'])
 @login_required
 def manager_dashboard():
-    if not current_user.is_manager():
+    user = current_user._get_current_object()
+    session = db.session()
+    if not user.is_manager():
         return _redirect_to_role_dashboard()
 
-    start_date, end_date, marketplace_id, company_id = _get_filters_from_request()
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
-    companies = User.query.filter_by(role='user').order_by(User.username.asc()).all()
-    company_ids = [company.id for company in companies]
-
-    if company_id not in company_ids and company_ids:
-        company_id = company_ids[0]
+    start_date, end_date, marketplace_id, company_id, companies = _dashboard_filters()
 
     if request.method == 'POST' and 'manager_note' in request.form:
         note_content = request.form.get('manager_note', '').strip()
         company_id_form = request.form.get('company_id', type=int)
-        if company_id_form not in company_ids:
+        if company_id_form not in {company.id for company in companies}:
             flash('Selecione uma empresa válida antes de salvar.', 'error')
             return redirect(
                 url_for(
@@ -345,24 +511,8 @@ def manager_dashboard():
         company_id = company_id_form
 
         if note_content:
-            note = ManagerNote.query.filter_by(
-                author_id=current_user.id,
-                periodo_inicio=start_date,
-                periodo_fim=end_date,
-                company_id=company_id,
-            ).first()
-            if note:
-                note.conteudo = note_content
-            else:
-                note = ManagerNote(
-                    periodo_inicio=start_date,
-                    periodo_fim=end_date,
-                    conteudo=note_content,
-                    author_id=current_user.id,
-                    company_id=company_id,
-                )
-                db.session.add(note)
-            db.session.commit()
+            _save_manager_note(session, user.id, start_date, end_date, company_id, note_content)
+            session.commit()
             flash('Comentário salvo com sucesso.', 'success')
         else:
             flash('Escreva um comentário antes de salvar.', 'error')
@@ -374,26 +524,16 @@ def manager_dashboard():
             )
         )
 
-    kpis = get_kpis(db.session, start_date, end_date, marketplace_id, company_id)
-    timeseries = sales_timeseries(db.session, start_date, end_date, marketplace_id, company_id)
-
-    no_data = (not timeseries['values']) and kpis['faturamento'] == 0.0 and kpis['pedidos_totais'] == 0.0
-    if no_data:
-        min_date, max_date = get_data_boundaries(db.session, marketplace_id, company_id)
-        if min_date and max_date:
-            if min_date > max_date:
-                min_date, max_date = max_date, min_date
-            if min_date != start_date or max_date != end_date:
-                start_date, end_date = min_date, max_date
-                kpis = get_kpis(db.session, start_date, end_date, marketplace_id, company_id)
-                timeseries = sales_timeseries(db.session, start_date, end_date, marketplace_id, company_id)
-
-    previous_start, previous_end = _get_previous_period(start_date, end_date)
-    previous_kpis = get_kpis(db.session, previous_start, previous_end, marketplace_id, company_id)
-    abc_data = abc_by_revenue(db.session, start_date, end_date, marketplace_id, company_id)
+    start_date, end_date, previous_start, previous_end, bundle = _load_dashboard_bundle(
+        session, start_date, end_date, marketplace_id, company_id, abc_limit=10
+    )
+    kpis = bundle['kpis']
+    timeseries = bundle['timeseries']
+    previous_kpis = bundle['previous_kpis']
+    abc_data = bundle['abc']
 
     manager_note = ManagerNote.query.filter_by(
-        author_id=current_user.id,
+        author_id=user.id,
         periodo_inicio=start_date,
         periodo_fim=end_date,
         company_id=company_id,
@@ -403,8 +543,7 @@ def manager_dashboard():
 
     return render_template(
         'dashboard_manager.html',
-        user=current_user,
-        marketplaces=marketplaces,
+        user=user,
         companies=companies,
         start_date=start_date,
         end_date=end_date,
@@ -414,7 +553,7 @@ def manager_dashboard():
         previous_period=(previous_start, previous_end),
         timeseries_labels=timeseries['labels'],
         timeseries_values=timeseries['values'],
-        abc_data=abc_data[:10],
+        abc_data=abc_data,
         manager_note=manager_note,
         insights=insights,
     )
@@ -423,29 +562,23 @@ def manager_dashboard():
 @dashboard_bp.route('/user')
 @login_required
 def user_dashboard():
-    if current_user.is_manager():
+    user = current_user._get_current_object()
+    session = db.session()
+    if user.is_manager():
         return _redirect_to_role_dashboard()
 
     start_date, end_date, marketplace_id, _ = _get_filters_from_request()
-    company_id = current_user.id
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
-    company_id = current_user.id
+    company_id = user.id
 
-    kpis = get_kpis(db.session, start_date, end_date, marketplace_id, company_id)
-    timeseries = sales_timeseries(db.session, start_date, end_date, marketplace_id, company_id)
-
-    no_data = (not timeseries['values']) and kpis['faturamento'] == 0.0 and kpis['pedidos_totais'] == 0.0
-    if no_data:
-        min_date, max_date = get_data_boundaries(db.session, marketplace_id, company_id)
-        if min_date and max_date:
-            if min_date > max_date:
-                min_date, max_date = max_date, min_date
-            if min_date != start_date or max_date != end_date:
-                start_date, end_date = min_date, max_date
-                kpis = get_kpis(db.session, start_date, end_date, marketplace_id, company_id)
-                timeseries = sales_timeseries(db.session, start_date, end_date, marketplace_id, company_id)
+    start_date, end_date, previous_start, previous_end, bundle = _load_dashboard_bundle(
+        session, start_date, end_date, marketplace_id, company_id, abc_limit=1
+    )
+    kpis = bundle['kpis']
+    timeseries = bundle['timeseries']
+    previous_kpis = bundle['previous_kpis']
+    abc_data = bundle['abc']
 
-    status_data = status_breakdown(db.session, start_date, end_date, marketplace_id, company_id)
+    status_data = status_breakdown(session, start_date, end_date, marketplace_id, company_id)
     status_items = [
         {
             'label': label.replace('_', ' ').title(),
@@ -454,11 +587,11 @@ def user_dashboard():
         for label, value in zip(status_data['labels'], status_data['values'])
     ]
 
-    top_products = top_products_by_revenue(db.session, start_date, end_date, marketplace_id)
-    monthly_sales = monthly_sales_counts(db.session, start_date, end_date, marketplace_id)
-    monthly_revenue = monthly_revenue_totals(db.session, start_date, end_date, marketplace_id)
-    sales_by_hour = sales_by_hour_of_day(db.session, start_date, end_date, marketplace_id)
-    sales_by_day = sales_by_day_of_week(db.session, start_date, end_date, marketplace_id)
+    top_products = top_products_by_revenue(session, start_date, end_date, marketplace_id)
+    monthly_sales = monthly_sales_counts(session, start_date, end_date, marketplace_id)
+    monthly_revenue = monthly_revenue_totals(session, start_date, end_date, marketplace_id)
+    sales_by_hour = sales_by_hour_of_day(session, start_date, end_date, marketplace_id)
+    sales_by_day = sales_by_day_of_week(session, start_date, end_date, marketplace_id)
 
     manager_note = (
         ManagerNote.query
@@ -467,15 +600,11 @@ def user_dashboard():
         .first()
     )
 
-    previous_start, previous_end = _get_previous_period(start_date, end_date)
-    previous_kpis = get_kpis(db.session, previous_start, previous_end, marketplace_id, company_id)
-    abc_data = abc_by_revenue(db.session, start_date, end_date, marketplace_id, company_id)
     insights = _generate_insights(kpis, previous_kpis, abc_data)
 
     return render_template(
         'dashboard_user.html',
-        user=current_user,
-        marketplaces=marketplaces,
+        user=user,
         start_date=start_date,
         end_date=end_date,
         selected_marketplace=marketplace_id,
@@ -504,7 +633,8 @@ def user_dashboard():
 @dashboard_bp.route('/settings', methods=['GET', 'POST'])
 @login_required
 def user_settings():
-    if current_user.is_manager():
+    user = current_user._get_current_object()
+    if user.is_manager():
         return _redirect_to_role_dashboard()
 
     if request.method == 'POST':
@@ -515,7 +645,7 @@ def user_settings():
         errors = []
         if not current_password:
             errors.append('Informe a senha atual.')
-        elif not current_user.check_password(current_password):
+        elif not user.check_password(current_password):
             errors.append('Senha atual incorreta.')
 
         if not new_password:
@@ -530,109 +660,147 @@ def user_settings():
             for message in errors:
                 flash(message, 'error')
         else:
-            current_user.set_password(new_password)
+            user.set_password(new_password)
             db.session.commit()
             flash('Senha atualizada com sucesso.', 'success')
             return redirect(url_for('dashboard.user_settings'))
 
-    return render_template('user_settings.html', user=current_user)
+    return render_template('user_settings.html', user=user)
+
+
+ABC_PAGE_SIZE = 50
+ABC_MAX_PAGE_SIZE = 200
+
+
+def _get_abc_pagination():
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    per_page = request.args.get('per_page', ABC_PAGE_SIZE, type=int) or ABC_PAGE_SIZE
+    per_page = min(max(per_page, 1), ABC_MAX_PAGE_SIZE)
+    search = (request.args.get('q') or '').strip()
+    return page, per_page, search
+
+
+def _abc_page(start_date, end_date, marketplace_id, company_id, page, per_page, search):
+    """Retorna as linhas da página solicitada e o número da próxima página (ou None)."""
+    rows = abc_by_revenue(
+        db.session,
+        start_date,
+        end_date,
+        marketplace_id,
+        company_id,
+        limit=per_page + 1,
+        offset=(page - 1) * per_page,
+        search=search or None,
+    )
+    next_page = page + 1 if len(rows) > per_page else None
+    return rows[:per_page], next_page
 
 
 @dashboard_bp.route('/abc')
 @login_required
+@conditional_dashboard
 def abc_view():
-    start_date, end_date, marketplace_id, company_id = _get_filters_from_request()
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
-
-    if current_user.is_manager():
-        companies = (
-            User.query.filter_by(role='user')
-            .order_by(User.username.asc())
-            .all()
-        )
-        company_ids = [company.id for company in companies]
-        if company_id not in company_ids and company_ids:
-            company_id = company_ids[0]
-    else:
-        company_id = current_user.id
-        companies = []
+    session = db.session()
+    start_date, end_date, marketplace_id, company_id, companies = _dashboard_filters()
+    page, per_page, search = _get_abc_pagination()
 
-    abc_data = abc_by_revenue(db.session, start_date, end_date, marketplace_id, company_id)
-    if not abc_data:
-        min_date, max_date = get_data_boundaries(db.session, marketplace_id, company_id)
+    abc_data, next_page = _abc_page(
+        start_date, end_date, marketplace_id, company_id, page, per_page, search
+    )
+    if not abc_data and page == 1 and not search:
+        min_date, max_date = get_data_boundaries(session, marketplace_id, company_id)
         if min_date and max_date:
             if min_date > max_date:
                 min_date, max_date = max_date, min_date
             if min_date != start_date or max_date != end_date:
                 start_date, end_date = min_date, max_date
-                abc_data = abc_by_revenue(db.session, start_date, end_date, marketplace_id, company_id)
+                abc_data, next_page = _abc_page(
+                    start_date, end_date, marketplace_id, company_id, page, per_page, search
+                )
 
-    chart_slice = abc_data[:10]
+    if page == 1 and not search:
+        chart_slice = abc_data[:10]
+    else:
+        chart_slice = abc_by_revenue(
+            session, start_date, end_date, marketplace_id, company_id, limit=10
+        )
     chart_labels = [item['sku'] for item in chart_slice]
     chart_revenue = [round(item['faturamento'], 2) for item in chart_slice]
     chart_cumulative = [round(item['percentual_acumulado'], 2) for item in chart_slice]
 
+    rows_url = url_for(
+        'dashboard.abc_rows',
+        per_page=per_page,
+        **_build_redirect_params(start_date, end_date, marketplace_id, company_id),
+    )
+
     return render_template(
         'dashboard_abc.html',
-        marketplaces=marketplaces,
         companies=companies,
         start_date=start_date,
         end_date=end_date,
         selected_marketplace=marketplace_id,
         selected_company=company_id,
         abc_data=abc_data,
+        next_page=next_page,
+        search=search,
+        rows_url=rows_url,
         chart_labels=chart_labels,
         chart_revenue=chart_revenue,
         chart_cumulative=chart_cumulative,
     )
 
 
+@dashboard_bp.route('/abc/rows')
+@login_required
+@conditional_dashboard
+def abc_rows():
+    """Fragmento HTML com a próxima página da tabela ABC (carregamento incremental)."""
+    start_date, end_date, marketplace_id, company_id, _ = _dashboard_filters()
+    page, per_page, search = _get_abc_pagination()
+
+    abc_data, next_page = _abc_page(
+        start_date, end_date, marketplace_id, company_id, page, per_page, search
+    )
+    response = make_response(
+        render_template('_partials/_abc_rows.html', abc_data=abc_data, show_empty=page == 1)
+    )
+    response.headers['X-Next-Page'] = str(next_page or '')
+    return response
+
+
 @dashboard_bp.route('/status')
 @login_required
+@conditional_dashboard
 def status_view():
-    start_date, end_date, marketplace_id, company_id = _get_filters_from_request()
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
+    session = db.session()
+    start_date, end_date, marketplace_id, company_id, companies = _dashboard_filters()
 
-    if current_user.is_manager():
-        companies = (
-            User.query.filter_by(role='user')
-            .order_by(User.username.asc())
-            .all()
-        )
-        company_ids = [company.id for company in companies]
-        if company_id not in company_ids and company_ids:
-            company_id = company_ids[0]
-    else:
-        company_id = current_user.id
-        companies = []
-
-    breakdown = status_breakdown(db.session, start_date, end_date, marketplace_id, company_id)
-    total_current = sum(breakdown['values'])
+    previous_start, previous_end = _get_previous_period(start_date, end_date)
+    breakdown = status_breakdown_with_previous(
+        session, start_date, end_date, previous_start, previous_end, marketplace_id, company_id
+    )
+    total_current = sum(breakdown['current'])
     if total_current == 0:
-        min_date, max_date = get_data_boundaries(db.session, marketplace_id, company_id)
+        min_date, max_date = get_data_boundaries(session, marketplace_id, company_id)
         if min_date and max_date:
             if min_date > max_date:
                 min_date, max_date = max_date, min_date
             if min_date != start_date or max_date != end_date:
                 start_date, end_date = min_date, max_date
-                breakdown = status_breakdown(db.session, start_date, end_date, marketplace_id, company_id)
-            total_current = sum(breakdown['values'])
-    previous_start, previous_end = _get_previous_period(start_date, end_date)
-    previous_breakdown = status_breakdown(db.session, previous_start, previous_end, marketplace_id, company_id)
-
-    current_map = dict(zip(breakdown['labels'], breakdown['values']))
-    previous_map = dict(zip(previous_breakdown['labels'], previous_breakdown['values']))
-
-    all_statuses = sorted(
-        set(current_map.keys()) | set(previous_map.keys()),
-        key=lambda status: current_map.get(status, 0),
-        reverse=True,
-    )
+                previous_start, previous_end = _get_previous_period(start_date, end_date)
+                breakdown = status_breakdown_with_previous(
+                    session, start_date, end_date, previous_start, previous_end,
+                    marketplace_id, company_id,
+                )
+            total_current = sum(breakdown['current'])
 
     status_rows = []
-    for status in all_statuses:
-        current_count = float(current_map.get(status, 0))
-        previous_count = float(previous_map.get(status, 0))
+    status_labels = []
+    status_values = []
+    for status, current_count, previous_count in zip(
+        breakdown['labels'], breakdown['current'], breakdown['previous']
+    ):
         if previous_count:
             variation = ((current_count - previous_count) / previous_count) * 100
         elif current_count > 0:
@@ -645,13 +813,12 @@ def status_view():
             'previous': int(previous_count) if previous_count.is_integer() else previous_count,
             'variation': variation,
         })
-
-    status_labels = [label.replace('_', ' ').title() for label in breakdown['labels']]
-    status_values = breakdown['values']
+        if current_count:
+            status_labels.append(status.replace('_', ' ').title())
+            status_values.append(current_count)
 
     return render_template(
         'dashboard_status.html',
-        marketplaces=marketplaces,
         companies=companies,
         start_date=start_date,
         end_date=end_date,
@@ -664,56 +831,88 @@ def status_view():
     )
 
 
+def _stream_dashboard(template_name, **context):
+    """
+    Renderiza o template em streaming para os dashboards pesados: o layout
+    base chega ao navegador enquanto os blocos com os gráficos são gerados.
+    """
+    # As mensagens flash saem da sessão antes de os cabeçalhos serem
+    # enviados; o template reaproveita a lista já carregada no request.
+    get_flashed_messages(with_categories=True)
+    return current_app.response_class(stream_template(template_name, **context))
+
+
+METRICS_MAX_WORKERS = 8
+
+
+def _run_metric(app, func, args, kwargs):
+    # Cada thread usa seu próprio app context e, portanto, sua própria sessão.
+    with app.app_context():
+        try:
+            return func(db.session(), *args, **kwargs)
+        finally:
+            db.session.remove()
+
+
+def _run_parallel(tasks):
+    """
+    Executa funções de métricas independentes em paralelo.
+    Recebe {nome: (função, args, kwargs)}, chama cada função com uma
+    sessão exclusiva da thread e devolve {nome: resultado}.
+    """
+    app = current_app._get_current_object()
+    with ThreadPoolExecutor(max_workers=min(METRICS_MAX_WORKERS, len(tasks))) as executor:
+        futures = {
+            name: executor.submit(_run_metric, app, func, args, kwargs)
+            for name, (func, args, kwargs) in tasks.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
 @dashboard_bp.route('/analytics')
 @login_required
+@conditional_dashboard
 def analytics_dashboard():
-    start_date, end_date, marketplace_id, company_id = _get_filters_from_request()
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
-
+    user = current_user._get_current_object()
+    session = db.session()
     # For managers, show company selector; for users, use their own company_id
-    if current_user.is_manager():
-        companies = User.query.filter_by(role='user').order_by(User.username.asc()).all()
-        company_ids = [company.id for company in companies]
-        if company_id not in company_ids and company_ids:
-            company_id = company_ids[0]
-    else:
-        company_id = current_user.id
-        companies = []
+    start_date, end_date, marketplace_id, company_id, companies = _dashboard_filters()
 
     # Check for data and adjust period if needed
-    kpis = get_kpis(db.session, start_date, end_date, marketplace_id, company_id)
+    kpis, (min_date, max_date) = get_kpis(
+        session, start_date, end_date, marketplace_id, company_id
+    )
     if kpis['faturamento'] == 0.0 and kpis['pedidos_totais'] == 0.0:
-        min_date, max_date = get_data_boundaries(db.session, marketplace_id, company_id)
         if min_date and max_date:
             if min_date > max_date:
                 min_date, max_date = max_date, min_date
             start_date, end_date = min_date, max_date
 
-    # Geographic Analysis
-    state_data = sales_by_state(db.session, start_date, end_date, marketplace_id, company_id, limit=10)
-    city_data = sales_by_city(db.session, start_date, end_date, marketplace_id, company_id, limit=15)
-
-    # Product & Margin Analysis
-    price_range_data = products_by_price_range(db.session, start_date, end_date, marketplace_id, company_id)
-    margin_products = top_products_with_margin(db.session, start_date, end_date, marketplace_id, company_id, limit=10)
-
-    # Shipping Performance
-    shipping_data = shipping_performance(db.session, start_date, end_date, marketplace_id, company_id)
-
-    # Customer Analysis
-    rfm_data = calculate_rfm_analysis(db.session, start_date, end_date, marketplace_id, company_id)
-    cohort_data = cohort_analysis(db.session, start_date, end_date, marketplace_id, company_id)
-
-    # RFM Segment Distribution
-    rfm_segments = {}
-    for customer in rfm_data:
-        segment = customer['segment']
-        rfm_segments[segment] = rfm_segments.get(segment, 0) + 1
-
-    return render_template(
+    filters = (start_date, end_date, marketplace_id, company_id)
+    results = _run_parallel({
+        # Geographic Analysis
+        'state': (sales_by_state, filters, {'limit': 10}),
+        'city': (sales_by_city, filters, {'limit': 15}),
+        # Product & Margin Analysis
+        'price_range': (products_by_price_range, filters, {}),
+        'margin': (top_products_with_margin, filters, {'limit': 10}),
+        # Shipping Performance
+        'shipping': (shipping_performance, filters, {}),
+        # Customer Analysis
+        'rfm': (calculate_rfm_analysis, filters, {'limit': 50}),
+        'cohort': (cohort_analysis, filters, {}),
+    })
+    state_data = results['state']
+    city_data = results['city']
+    price_range_data = results['price_range']
+    margin_products = results['margin']
+    shipping_data = results['shipping']
+    rfm_data, rfm_segments = results['rfm']
+    cohort_data = results['cohort']
+
+    return _stream_dashboard(
         'dashboard_analytics.html',
-        marketplaces=marketplaces,
-        companies=companies if current_user.is_manager() else [],
+        companies=companies if user.is_manager() else [],
         start_date=start_date,
         end_date=end_date,
         selected_marketplace=marketplace_id,
@@ -730,7 +929,7 @@ def analytics_dashboard():
         # Shipping
         shipping_data=shipping_data,
         # Customer Analysis
-        rfm_data=rfm_data[:50],  # Limit to top 50 for display
+        rfm_data=rfm_data,
         rfm_segments=rfm_segments,
         cohort_labels=cohort_data['cohort_labels'],
         cohort_period_labels=cohort_data['period_labels'],
@@ -740,55 +939,52 @@ def analytics_dashboard():
 
 @dashboard_bp.route('/consolidated')
 @login_required
+@conditional_dashboard
 def consolidated_dashboard():
     """
     Dashboard consolidado com visão geral de 6 análises em grid 2x3.
     """
-    start_date, end_date, marketplace_id, company_id = _get_filters_from_request()
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
-
+    user = current_user._get_current_object()
+    session = db.session()
     # Para gestores, mostrar seletor de empresa; para usuários, usar próprio company_id
-    if current_user.is_manager():
-        companies = User.query.filter_by(role='user').order_by(User.username.asc()).all()
-        company_ids = [company.id for company in companies]
-        if company_id not in company_ids and company_ids:
-            company_id = company_ids[0]
-    else:
-        company_id = current_user.id
-        companies = []
+    start_date, end_date, marketplace_id, company_id, companies = _dashboard_filters()
 
     # Verificar dados e ajustar período se necessário
-    kpis = get_kpis(db.session, start_date, end_date, marketplace_id, company_id)
+    kpis, (min_date, max_date) = get_kpis(
+        session, start_date, end_date, marketplace_id, company_id
+    )
     if kpis['faturamento'] == 0.0 and kpis['pedidos_totais'] == 0.0:
-        min_date, max_date = get_data_boundaries(db.session, marketplace_id, company_id)
         if min_date and max_date:
             if min_date > max_date:
                 min_date, max_date = max_date, min_date
             start_date, end_date = min_date, max_date
 
-    # Coletar todas as análises
-    # 1. Faturamento diário com tendência
-    daily_sales = sales_with_moving_average(db.session, start_date, end_date, marketplace_id, company_id)
-
-    # 2. Top 5 produtos (ABC)
-    top_5_products = top_products_by_revenue(db.session, start_date, end_date, marketplace_id, company_id, limit=5)
-
-    # 3. Vendas por hora do dia
-    hourly_sales = sales_by_hour_of_day(db.session, start_date, end_date, marketplace_id, company_id)
-
-    # 4. Vendas por dia da semana
-    weekly_sales = sales_by_day_of_week(db.session, start_date, end_date, marketplace_id, company_id)
-
-    # 5. Top 5 estados
-    top_states = sales_by_state(db.session, start_date, end_date, marketplace_id, company_id, limit=5)
-
-    # 6. Faixa de preço
-    price_ranges = products_by_price_range(db.session, start_date, end_date, marketplace_id, company_id)
-
-    return render_template(
+    # Coletar todas as análises em paralelo
+    filters = (start_date, end_date, marketplace_id, company_id)
+    results = _run_parallel({
+        # 1. Faturamento diário com tendência
+        'daily': (sales_with_moving_average, filters, {}),
+        # 2. Top 5 produtos (ABC)
+        'top5': (top_products_by_revenue, filters, {'limit': 5}),
+        # 3. Vendas por hora do dia
+        'hourly': (sales_by_hour_of_day, filters, {}),
+        # 4. Vendas por dia da semana
+        'weekly': (sales_by_day_of_week, filters, {}),
+        # 5. Top 5 estados
+        'states': (sales_by_state, filters, {'limit': 5}),
+        # 6. Faixa de preço
+        'price': (products_by_price_range, filters, {}),
+    })
+    daily_sales = results['daily']
+    top_5_products = results['top5']
+    hourly_sales = results['hourly']
+    weekly_sales = results['weekly']
+    top_states = results['states']
+    price_ranges = results['price']
+
+    return _stream_dashboard(
         'dashboard_consolidated.html',
-        marketplaces=marketplaces,
-        companies=companies if current_user.is_manager() else [],
+        companies=companies if user.is_manager() else [],
         start_date=start_date,
         end_date=end_date,
         selected_marketplace=marketplace_id,
@@ -1,154 +1,216 @@
 import csv
 import io
+from collections import namedtuple
 from datetime import datetime, date
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import islice
 
 from flask import flash, redirect, render_template, request, url_for, send_file
 from flask_login import current_user, login_required
+from sqlalchemy import insert, select, tuple_
 from sqlalchemy.orm import joinedload
 
 from app import db
 from app.data import data_bp
 from app.models import Marketplace, Sale, User
+from app.services.bootstrap import get_marketplaces, get_user_companies
+from app.services.metrics import invalidate_data_boundaries, record_data_boundaries
+from app.utils.sql import copy_rows, dialect_insert
 
 
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
+TEMPLATE_COLUMNS = 19  # Colunas do template_importacao.csv
+TEMPLATE_MAX_AGE = 24 * 60 * 60  # Cache do template CSV no navegador (1 dia)
+MAX_REPORTED_ERRORS = 5  # Erros guardados e exibidos por importação; os demais só são contados
 
 
-def parse_template_csv(raw_bytes: bytes) -> tuple[list[dict], list[str]]:
+def _parse_sale_date(value: str) -> date:
     """
-    Parse CSV baseado no template padronizado.
-    Lê colunas por POSIÇÃO, não por nome.
-
-    Returns:
-        Tuple (lista de dicts normalizados, lista de erros)
+    Converte YYYY-MM-DD com date.fromisoformat (em C); outras formas aceitas
+    por strptime('%Y-%m-%d'), como 2025-3-1, seguem pelo caminho antigo.
     """
-    errors = []
-    parsed_data = []
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+PRICE_RANGE_LOW_LIMIT = Decimal('50')
+PRICE_RANGE_HIGH_LIMIT = Decimal('200')
+
+
+PRICE_RANGES = ('Baixo', 'Médio', 'Alto')
+
+
+def _classify_price(preco: Decimal | None) -> str | None:
+    """Faixa de preço ('Baixo' < 50 <= 'Médio' <= 200 < 'Alto'); None sem preço."""
+    if not preco:
+        return None
+    # Soma de booleanos dá o índice da faixa (0, 1 ou 2) sem if/elif
+    return PRICE_RANGES[(preco >= PRICE_RANGE_LOW_LIMIT) + (preco > PRICE_RANGE_HIGH_LIMIT)]
+
+
+# Status aceitos na importação; qualquer outro valor vira 'pago'
+IMPORT_STATUSES = frozenset({'pago', 'enviado', 'entregue', 'cancelado'})
+
+# Colunas 13-18: dados financeiros (posição, campo)
+FINANCIAL_COLUMNS = (
+    (13, 'receita_produtos'),
+    (14, 'taxa_parcelamento'),
+    (15, 'tarifa_venda_impostos'),
+    (16, 'custo_envio'),
+    (17, 'lucro_liquido'),
+    (18, 'margem_percentual'),
+)
 
-    # Tentar decodificar com UTF-8
+
+@lru_cache(maxsize=4096)
+def _parse_decimal(value: str) -> Decimal:
+    # Planilhas repetem muitos valores (preços, fretes); Decimal é imutável e pode ser reaproveitado.
+    return Decimal(value)
+
+
+class ImportErrors:
+    """Primeiras MAX_REPORTED_ERRORS mensagens de erro de uma importação e o total encontrado."""
+
+    __slots__ = ('messages', 'count')
+
+    def __init__(self):
+        self.messages: list[str] = []
+        self.count = 0
+
+    def add(self, line_num: int | None, message: str) -> None:
+        # Arquivos muito ruins não materializam uma mensagem por linha:
+        # depois do limite só o total é incrementado.
+        self.count += 1
+        if self.count <= MAX_REPORTED_ERRORS:
+            self.messages.append(message if line_num is None else f"Linha {line_num}: {message}")
+
+
+def iter_template_rows(stream, encoding: str, errors: ImportErrors):
+    """
+    Gera um dict normalizado por linha válida do stream binário (template
+    padronizado, lido por POSIÇÃO das colunas, não por nome), registrando
+    as rejeitadas em ``errors``. Um encoding errado levanta UnicodeDecodeError
+    durante a iteração, não na chamada.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding=encoding, newline='')
     try:
-        text_content = raw_bytes.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        try:
-            text_content = raw_bytes.decode('utf-8')
-        except UnicodeDecodeError:
-            try:
-                text_content = raw_bytes.decode('latin-1')
-            except UnicodeDecodeError:
-                errors.append("Erro: Não foi possível decodificar o arquivo. Use UTF-8.")
-                return [], errors
+        yield from _parse_template_rows(csv.reader(text_stream, delimiter=','), errors)
+    finally:
+        # Não fechar o stream do upload junto com o wrapper
+        text_stream.detach()
 
-    # Ler CSV
-    text_stream = io.StringIO(text_content)
-    reader = csv.reader(text_stream, delimiter=',')
 
+def _parse_template_rows(reader, errors: ImportErrors):
     # IGNORAR primeira linha (cabeçalho)
     try:
         next(reader)
     except StopIteration:
-        errors.append("Arquivo vazio")
-        return [], errors
+        errors.add(None, "Arquivo vazio")
+        return
+
+    # Nomes usados a cada linha ficam em locais (evita LOAD_GLOBAL no laço)
+    parse_date = _parse_sale_date
+    parse_decimal = _parse_decimal
+    classify_price = _classify_price
+    reject = errors.add
+    template_columns = TEMPLATE_COLUMNS
+    financial_columns = FINANCIAL_COLUMNS
+    valid_statuses = IMPORT_STATUSES
 
     # Processar linhas por POSIÇÃO
     for line_num, row in enumerate(reader, start=2):  # Linha 2 = primeira com dados
         try:
             # Verificar se tem colunas mínimas
             if len(row) < 5:
-                errors.append(f"Linha {line_num}: Dados insuficientes (mínimo 5 colunas)")
+                reject(line_num, "Dados insuficientes (mínimo 5 colunas)")
                 continue
 
+            # Cada célula é limpa uma única vez; colunas ausentes viram ''.
+            cells = [cell.strip() for cell in row]
+            if len(cells) < template_columns:
+                cells.extend([''] * (template_columns - len(cells)))
+
             # LER POR POSIÇÃO (não por nome!)
             normalized = {}
 
             # Coluna 0: data_venda (obrigatória)
             try:
-                date_str = row[0].strip()
-                normalized['data_venda'] = datetime.strptime(date_str, '%Y-%m-%d').date()
-            except (ValueError, IndexError):
-                errors.append(f"Linha {line_num}: Data inválida (use formato YYYY-MM-DD)")
+                normalized['data_venda'] = parse_date(cells[0])
+            except ValueError:
+                reject(line_num, "Data inválida (use formato YYYY-MM-DD)")
                 continue
 
             # Coluna 1: sku (obrigatório)
-            normalized['sku'] = row[1].strip() if len(row) > 1 and row[1].strip() else None
+            normalized['sku'] = cells[1] or None
             if not normalized['sku']:
-                errors.append(f"Linha {line_num}: SKU obrigatório")
+                reject(line_num, "SKU obrigatório")
                 continue
 
             # Coluna 2: nome_produto (obrigatório)
-            normalized['nome_produto'] = row[2].strip() if len(row) > 2 and row[2].strip() else None
+            normalized['nome_produto'] = cells[2] or None
             if not normalized['nome_produto']:
-                errors.append(f"Linha {line_num}: Nome do produto obrigatório")
+                reject(line_num, "Nome do produto obrigatório")
                 continue
 
             # Coluna 3: status_pedido (obrigatório)
-            status = row[3].strip().lower() if len(row) > 3 and row[3].strip() else 'pago'
-            valid_statuses = ['pago', 'enviado', 'entregue', 'cancelado']
+            status = cells[3].lower()
             normalized['status_pedido'] = status if status in valid_statuses else 'pago'
 
             # Coluna 4: valor_total_venda (obrigatório)
             try:
-                normalized['valor_total_venda'] = Decimal(row[4].strip()) if len(row) > 4 and row[4].strip() else None
+                normalized['valor_total_venda'] = parse_decimal(cells[4]) if cells[4] else None
                 if normalized['valor_total_venda'] is None:
-                    errors.append(f"Linha {line_num}: Valor total obrigatório")
+                    reject(line_num, "Valor total obrigatório")
                     continue
             except (ValueError, InvalidOperation):
-                errors.append(f"Linha {line_num}: Valor total inválido")
+                reject(line_num, "Valor total inválido")
                 continue
 
             # Colunas opcionais (5 em diante)
-            normalized['numero_pedido'] = row[5].strip() if len(row) > 5 and row[5].strip() else None
+            normalized['numero_pedido'] = cells[5] or None
 
             # Coluna 6: unidades
             try:
-                normalized['unidades'] = int(row[6].strip()) if len(row) > 6 and row[6].strip() else None
-            except (ValueError, IndexError):
+                normalized['unidades'] = int(cells[6]) if cells[6] else None
+            except ValueError:
                 normalized['unidades'] = None
 
             # Coluna 7: preco_unitario
             try:
-                normalized['preco_unitario'] = Decimal(row[7].strip()) if len(row) > 7 and row[7].strip() else None
-            except (ValueError, InvalidOperation, IndexError):
+                normalized['preco_unitario'] = parse_decimal(cells[7]) if cells[7] else None
+            except (ValueError, InvalidOperation):
                 normalized['preco_unitario'] = None
 
             # Colunas 8-12: dados do cliente e geografia
-            normalized['comprador'] = row[8].strip() if len(row) > 8 and row[8].strip() else None
-            normalized['cpf_comprador'] = row[9].strip() if len(row) > 9 and row[9].strip() else None
-            normalized['estado_comprador'] = row[10].strip() if len(row) > 10 and row[10].strip() else None
-            normalized['cidade_comprador'] = row[11].strip() if len(row) > 11 and row[11].strip() else None
-            normalized['forma_entrega'] = row[12].strip() if len(row) > 12 and row[12].strip() else None
+            normalized['comprador'] = cells[8] or None
+            normalized['cpf_comprador'] = cells[9] or None
+            normalized['estado_comprador'] = cells[10] or None
+            normalized['cidade_comprador'] = cells[11] or None
+            normalized['forma_entrega'] = cells[12] or None
 
             # Colunas 13-18: dados financeiros
-            for idx, field in [
-                (13, 'receita_produtos'),
-                (14, 'taxa_parcelamento'),
-                (15, 'tarifa_venda_impostos'),
-                (16, 'custo_envio'),
-                (17, 'lucro_liquido'),
-                (18, 'margem_percentual')
-            ]:
+            for idx, field in financial_columns:
                 try:
-                    normalized[field] = Decimal(row[idx].strip()) if len(row) > idx and row[idx].strip() else None
-                except (ValueError, InvalidOperation, IndexError):
+                    normalized[field] = parse_decimal(cells[idx]) if cells[idx] else None
+                except (ValueError, InvalidOperation):
                     normalized[field] = None
 
             # Calcular faixa de preço
-            preco = normalized.get('preco_unitario') or normalized.get('valor_total_venda')
-            if preco:
-                if preco < Decimal('50'):
-                    normalized['faixa_preco'] = 'Baixo'
-                elif preco <= Decimal('200'):
-                    normalized['faixa_preco'] = 'Médio'
-                else:
-                    normalized['faixa_preco'] = 'Alto'
-
-            parsed_data.append(normalized)
+            normalized['faixa_preco'] = classify_price(
+                normalized['preco_unitario'] or normalized['valor_total_venda']
+            )
 
         except Exception as e:
-            errors.append(f"Linha {line_num}: Erro inesperado - {str(e)}")
+            reject(line_num, f"Erro inesperado - {str(e)}")
             continue
 
-    return parsed_data, errors
+        yield normalized
 
 
 @data_bp.route("/upload", methods=["GET"])
@@ -158,8 +220,8 @@ def upload_form():
         flash("Acesso restrito aos gestores.", "error")
         return redirect(url_for("dashboard.user_dashboard"))
 
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
-    companies = User.query.filter_by(role='user').order_by(User.username.asc()).all()
+    marketplaces = get_marketplaces()
+    companies = get_user_companies()
     selected_company = request.args.get("company_id", type=int)
 
     return render_template(
@@ -188,10 +250,132 @@ def download_template():
         template_path,
         as_attachment=True,
         download_name='template_importacao_alyal.csv',
-        mimetype='text/csv'
+        mimetype='text/csv',
+        conditional=True,
+        max_age=TEMPLATE_MAX_AGE,
     )
 
 
+INSERT_CHUNK_SIZE = 5000
+
+
+def _upload_error(message: str):
+    """Mensagem de erro e volta ao formulário de upload."""
+    flash(message, "error")
+    return redirect(url_for("data.upload_form"))
+
+
+def _sale_hash(row_data: dict, company_id: int | None) -> bytes:
+    """Hash de 16 bytes da linha normalizada (com a empresa), usado na deduplicação."""
+    canonical = '|'.join(map(str, (company_id, *row_data.values())))
+    return blake2b(canonical.encode(), digest_size=16).digest()
+
+
+def _new_sales_by_hash(chunk: list[dict], marketplace_id: int, company_id: int | None, seen: set) -> dict:
+    """
+    Linhas do bloco a importar indexadas pelo hash: repetições no arquivo
+    (``seen`` acumula os hashes dos blocos anteriores) ficam só com a primeira
+    ocorrência, e hashes já gravados no marketplace saem.
+    """
+    by_hash = {}
+    for row_data in chunk:
+        sale_hash = _sale_hash(row_data, company_id)
+        if sale_hash not in seen:
+            seen.add(sale_hash)
+            by_hash[sale_hash] = row_data
+
+    if by_hash:
+        existing = db.session.execute(
+            select(Sale.sale_hash).where(
+                Sale.marketplace_id == marketplace_id,
+                Sale.sale_hash.in_(list(by_hash)),
+            )
+        ).scalars()
+        for sale_hash in existing:
+            by_hash.pop(sale_hash, None)
+    return by_hash
+
+
+def _insert_chunk(new_sales: list[tuple[bytes, dict]], marketplace_id: int, company_id: int | None, statement) -> None:
+    """
+    No PostgreSQL (psycopg 3) as linhas seguem por COPY FROM STDIN para uma
+    tabela temporária e dela para sale com ON CONFLICT DO NOTHING (uploads
+    simultâneos do mesmo arquivo não falham); nos demais bancos, por
+    ``statement`` em executemany (insertmanyvalues), sem instanciar objetos Sale.
+    """
+    fields = tuple(new_sales[0][1])
+    copied = copy_rows(
+        db.session,
+        Sale.__table__,
+        ('marketplace_id', 'company_id', 'sale_hash') + fields,
+        (
+            (marketplace_id, company_id, sale_hash, *(row_data[field] for field in fields))
+            for sale_hash, row_data in new_sales
+        ),
+        conflict_columns=('marketplace_id', 'sale_hash'),
+    )
+    if not copied:
+        db.session.execute(
+            statement,
+            [
+                dict(row_data, marketplace_id=marketplace_id, company_id=company_id, sale_hash=sale_hash)
+                for sale_hash, row_data in new_sales
+            ],
+        )
+
+
+ImportResult = namedtuple('ImportResult', 'total_rows imported_count min_date max_date')
+
+
+def _import_sales(rows, marketplace_id: int, company_id: int | None) -> ImportResult:
+    """
+    Consome ``rows`` em blocos de INSERT_CHUNK_SIZE e insere as linhas ainda
+    não importadas, sem manter o arquivo inteiro em memória. Tudo roda na
+    transação da sessão; o commit fica com quem chama.
+    """
+    upsert = dialect_insert(db.session)
+    if upsert is not None:
+        statement = upsert(Sale).on_conflict_do_nothing(index_elements=['marketplace_id', 'sale_hash'])
+    else:
+        statement = insert(Sale)
+
+    seen = set()
+    total_rows = imported_count = 0
+    min_date = max_date = None
+    while True:
+        chunk = list(islice(rows, INSERT_CHUNK_SIZE))
+        if not chunk:
+            break
+        total_rows += len(chunk)
+        sale_dates = [row_data['data_venda'] for row_data in chunk]
+        chunk_min, chunk_max = min(sale_dates), max(sale_dates)
+        min_date = chunk_min if min_date is None else min(min_date, chunk_min)
+        max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+
+        new_sales = list(_new_sales_by_hash(chunk, marketplace_id, company_id, seen).items())
+        if new_sales:
+            _insert_chunk(new_sales, marketplace_id, company_id, statement)
+            imported_count += len(new_sales)
+
+    return ImportResult(total_rows, imported_count, min_date, max_date)
+
+
+def _import_upload(stream, marketplace_id: int, company_id: int | None) -> tuple[ImportResult, ImportErrors]:
+    """
+    Importa o arquivo direto do stream. Se o UTF-8 falhar no meio da leitura,
+    desfaz os blocos já inseridos e reprocessa como latin-1.
+    """
+    errors = ImportErrors()
+    try:
+        result = _import_sales(iter_template_rows(stream, 'utf-8-sig', errors), marketplace_id, company_id)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        stream.seek(0)
+        errors = ImportErrors()
+        result = _import_sales(iter_template_rows(stream, 'latin-1', errors), marketplace_id, company_id)
+    return result, errors
+
+
 @data_bp.route("/upload", methods=["POST"])
 @login_required
 def upload_submit():
@@ -207,28 +391,19 @@ def upload_submit():
     try:
         marketplace_id_int = int(marketplace_id)
     except (TypeError, ValueError):
-        flash("Selecione um marketplace válido.", "error")
-        return redirect(url_for("data.upload_form"))
+        return _upload_error("Selecione um marketplace válido.")
 
     try:
         company_id_int = int(company_id) if company_id else None
     except (TypeError, ValueError):
-        flash("Selecione uma empresa válida.", "error")
-        return redirect(url_for("data.upload_form"))
-
-    marketplace = db.session.get(Marketplace, marketplace_id_int)
-    if not marketplace:
-        flash("Marketplace não encontrado.", "error")
-        return redirect(url_for("data.upload_form"))
+        return _upload_error("Selecione uma empresa válida.")
 
     if not file or file.filename == "":
-        flash("Envie um arquivo CSV no formato do template.", "error")
-        return redirect(url_for("data.upload_form"))
+        return _upload_error("Envie um arquivo CSV no formato do template.")
 
     # Validar extensão
     if not file.filename.lower().endswith('.csv'):
-        flash("Apenas arquivos CSV são aceitos. Use o template fornecido.", "error")
-        return redirect(url_for("data.upload_form"))
+        return _upload_error("Apenas arquivos CSV são aceitos. Use o template fornecido.")
 
     # Validar tamanho
     file.stream.seek(0, io.SEEK_END)
@@ -236,61 +411,111 @@ def upload_submit():
     file.stream.seek(0)
 
     if size > MAX_UPLOAD_SIZE:
-        flash("Arquivo excede o tamanho máximo de 50MB.", "error")
-        return redirect(url_for("data.upload_form"))
+        return _upload_error("Arquivo excede o tamanho máximo de 50MB.")
 
-    # Ler arquivo
-    raw_bytes = file.read()
-    if not raw_bytes:
-        flash("Arquivo vazio.", "error")
-        return redirect(url_for("data.upload_form"))
+    if not size:
+        return _upload_error("Arquivo vazio.")
+
+    # Validação no banco por chave primária, depois das checagens baratas: as listas
+    # em cache de outro worker podem não ter visto um cadastro ou remoção recente
+    if db.session.get(Marketplace, marketplace_id_int) is None:
+        return _upload_error("Marketplace não encontrado.")
 
-    # PROCESSAR com função simples por posição
-    parsed_data, errors = parse_template_csv(raw_bytes)
+    if company_id_int is not None:
+        company = db.session.get(User, company_id_int)
+        if company is None or company.role != 'user':
+            return _upload_error("Empresa não encontrada.")
 
-    if not parsed_data:
+    # PROCESSAR por posição, direto do stream: as linhas válidas são inseridas
+    # em blocos dentro de uma única transação
+    result, errors = _import_upload(file.stream, marketplace_id_int, company_id_int)
+
+    if not result.total_rows:
         flash("Nenhum dado válido encontrado no arquivo.", "error")
-        if errors:
-            for error in errors[:5]:
-                flash(error, "error")
+        for error in errors.messages:
+            flash(error, "error")
         return redirect(url_for("data.upload_form"))
 
-    # Criar objetos Sale
-    sales_to_insert = []
-    for row_data in parsed_data:
-        try:
-            sale = Sale(
-                marketplace_id=marketplace.id,
-                company_id=company_id_int,
-                **row_data
-            )
-            sales_to_insert.append(sale)
-        except Exception as e:
-            errors.append(f"Erro ao criar venda: {str(e)}")
-
-    # Salvar no banco
-    if sales_to_insert:
-        db.session.bulk_save_objects(sales_to_insert)
-        db.session.commit()
+    record_data_boundaries(
+        db.session, marketplace_id_int, company_id_int, result.min_date, result.max_date
+    )
+    db.session.commit()
+    invalidate_data_boundaries()
 
     # Feedback
-    total_rows = len(parsed_data)
-    imported_count = len(sales_to_insert)
+    total_rows = result.total_rows
+    imported_count = result.imported_count
+
+    duplicate_count = total_rows - imported_count
+    duplicate_note = f" {duplicate_count} linhas repetidas foram ignoradas." if duplicate_count else ""
 
     flash(
-        f"✅ Importação concluída: {imported_count} registros importados de {total_rows} linhas processadas.",
+        f"✅ Importação concluída: {imported_count} registros importados de {total_rows} linhas processadas.{duplicate_note}",
         "success"
     )
 
-    if errors:
-        for error in errors[:5]:
-            flash(error, "error")
-        if len(errors) > 5:
-            flash(f"⚠️ {len(errors) - 5} erros adicionais foram omitidos.", "error")
+    for error in errors.messages:
+        flash(error, "error")
+    if errors.count > len(errors.messages):
+        flash(f"⚠️ {errors.count - len(errors.messages)} erros adicionais foram omitidos.", "error")
 
     return redirect(url_for("data.upload_form", company_id=company_id_int))
 
 
+SALES_PAGE_SIZE = 25
+
+
+def _parse_cursor(prefix: str):
+    """Lê o cursor (data_venda, id) de ?<prefix>_date=...&<prefix>_id=...; None se ausente ou inválido."""
+    cursor_id = request.args.get(f"{prefix}_id", type=int)
+    cursor_date = request.args.get(f"{prefix}_date")
+    if not cursor_id or not cursor_date:
+        return None
+    try:
+        return date.fromisoformat(cursor_date), cursor_id
+    except ValueError:
+        return None
+
+
+def _keyset_page(query):
+    """
+    Paginação por cursor sobre (data_venda DESC, id DESC): cada página é um
+    range scan no índice a partir da última linha exibida, sem OFFSET.
+    Retorna (vendas, dict com has_prev/has_next e os cursores dos links).
+    """
+    key = tuple_(Sale.data_venda, Sale.id)
+    after = _parse_cursor("after")
+    before = None if after else _parse_cursor("before")
+
+    if before:
+        rows = (
+            query.filter(key > tuple_(*before))
+            .order_by(Sale.data_venda.asc(), Sale.id.asc())
+            .limit(SALES_PAGE_SIZE + 1)
+            .all()
+        )
+        has_prev, has_next = len(rows) > SALES_PAGE_SIZE, True
+        rows = rows[:SALES_PAGE_SIZE][::-1]
+    else:
+        if after:
+            query = query.filter(key < tuple_(*after))
+        rows = (
+            query.order_by(Sale.data_venda.desc(), Sale.id.desc())
+            .limit(SALES_PAGE_SIZE + 1)
+            .all()
+        )
+        has_prev, has_next = after is not None, len(rows) > SALES_PAGE_SIZE
+        rows = rows[:SALES_PAGE_SIZE]
+
+    pagination = {
+        "has_prev": has_prev and bool(rows),
+        "has_next": has_next and bool(rows),
+        "prev_cursor": (rows[0].data_venda.isoformat(), rows[0].id) if rows else None,
+        "next_cursor": (rows[-1].data_venda.isoformat(), rows[-1].id) if rows else None,
+    }
+    return rows, pagination
+
+
 @data_bp.route("/list")
 @login_required
 def sales_list():
@@ -298,18 +523,14 @@ def sales_list():
         flash("Acesso restrito aos gestores.", "error")
         return redirect(url_for("dashboard.user_dashboard"))
 
-    marketplaces = Marketplace.query.order_by(Marketplace.nome.asc()).all()
-    companies = User.query.filter_by(role='user').order_by(User.username.asc()).all()
-    page = request.args.get("page", default=1, type=int)
+    marketplaces = get_marketplaces()
+    companies = get_user_companies()
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
     marketplace_id = request.args.get("marketplace_id", type=int)
     company_id = request.args.get("company_id", type=int)
 
-    query = (
-        Sale.query.options(joinedload(Sale.marketplace), joinedload(Sale.company))
-        .order_by(Sale.data_venda.desc(), Sale.id.desc())
-    )
+    query = Sale.query.options(joinedload(Sale.marketplace), joinedload(Sale.company))
 
     try:
         if start_date:
@@ -334,13 +555,13 @@ def sales_list():
     if company_id:
         query = query.filter(Sale.company_id == company_id)
 
-    pagination = query.paginate(page=page, per_page=25, error_out=False)
+    sales, pagination = _keyset_page(query)
 
     return render_template(
         "data_list.html",
         marketplaces=marketplaces,
         companies=companies,
-        sales=pagination.items,
+        sales=sales,
         pagination=pagination,
         selected_marketplace=marketplace_id,
         selected_company=company_id,
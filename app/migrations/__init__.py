@@ -4,17 +4,28 @@ from typing import Callable, Iterable, Optional
 
 from flask_sqlalchemy import SQLAlchemy
 
+from .data_boundaries import ensure_data_boundaries
+from .indexes import ensure_manager_note_indexes, ensure_sale_indexes
 from .manager_note_company import ensure_manager_note_company_id
+from .manager_note_duplicates import collapse_duplicate_manager_notes
+from .sale_status import normalize_sale_statuses
 
 
 def run_all_migrations(
     db: SQLAlchemy, runners: Optional[Iterable[Callable[[SQLAlchemy], None]]] = None
 ) -> None:
-    """Execute registered migration routines safely."""
+    """Execute registered migration routines; the caller owns the commit."""
 
     tasks: Iterable[Callable[[SQLAlchemy], None]]
     if runners is None:
-        tasks = (ensure_manager_note_company_id,)
+        tasks = (
+            ensure_manager_note_company_id,
+            collapse_duplicate_manager_notes,
+            ensure_manager_note_indexes,
+            ensure_sale_indexes,
+            ensure_data_boundaries,
+            normalize_sale_statuses,
+        )
     else:
         tasks = tuple(runner for runner in runners if runner)
 
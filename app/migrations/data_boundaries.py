@@ -0,0 +1,23 @@
+"""Backfill for the company_data_boundaries summary table."""
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+
+def ensure_data_boundaries(db: SQLAlchemy) -> None:
+    """Populate company_data_boundaries from existing sales when it is still empty."""
+
+    already_filled = db.session.execute(
+        text('SELECT 1 FROM company_data_boundaries LIMIT 1')
+    ).first()
+    if already_filled:
+        return
+
+    db.session.execute(
+        text(
+            'INSERT INTO company_data_boundaries '
+            '(company_id, marketplace_id, min_date, max_date, updated_at) '
+            'SELECT COALESCE(company_id, 0), marketplace_id, MIN(data_venda), MAX(data_venda), '
+            'CURRENT_TIMESTAMP FROM sale GROUP BY COALESCE(company_id, 0), marketplace_id'
+        )
+    )
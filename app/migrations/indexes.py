@@ -0,0 +1,60 @@
+"""Migration helpers that add model indexes to databases created earlier."""
+
+from typing import Iterable
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+
+def _create_table_indexes(db: SQLAlchemy, table, names: Iterable[str]) -> None:
+    wanted = set(names)
+    for index in table.indexes:
+        if index.name in wanted:
+            db.session.execute(CreateIndex(index, if_not_exists=True))
+
+
+def ensure_manager_note_indexes(db: SQLAlchemy) -> None:
+    """
+    Replace the plain (author, period, company) index with the unique ones:
+    one over the four columns and a partial one for notes without company,
+    which the four-column index cannot constrain because NULLs never conflict.
+    Runs after collapse_duplicate_manager_notes.
+    """
+
+    from app.models import ManagerNote
+
+    db.session.execute(text('DROP INDEX IF EXISTS ix_manager_note_author_periodo'))
+    _create_table_indexes(
+        db,
+        ManagerNote.__table__,
+        ('ux_manager_note_author_periodo', 'ux_manager_note_author_periodo_no_company'),
+    )
+
+
+def ensure_sale_indexes(db: SQLAlchemy) -> None:
+    """
+    Create the composite Sale indexes used by the dashboards, the sales list
+    and import dedupe, and drop the single-column ones they make redundant.
+    """
+
+    from app.models import Sale
+
+    _create_table_indexes(
+        db,
+        Sale.__table__,
+        (
+            'ix_sale_mk_data',
+            'ix_sale_data_mk',
+            'ix_sale_company_data',
+            'ix_sale_company_mk_data',
+            'ix_sale_company_mk_data_desc',
+            'ix_sale_mk_data_desc',
+            'ux_sale_mk_hash',
+        ),
+    )
+    # Single-column indexes now covered by the composites above (leading column).
+    # ix_sale_data_venda stays: with the implicit id it serves the unfiltered
+    # sales list ORDER BY data_venda DESC, id DESC without a sort.
+    for name in ('ix_sale_marketplace_id', 'ix_sale_company_id'):
+        db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
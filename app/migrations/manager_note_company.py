@@ -1,22 +1,13 @@
 """Migration helpers for ManagerNote.company_id backfill."""
 
-from typing import List, Sequence
-
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import inspect, text
 
 
-def _fetch_company_ids(db: SQLAlchemy) -> List[int]:
-    result = db.session.execute(
-        text("SELECT id FROM user WHERE role = 'user' ORDER BY id")
-    )
-    return [row[0] for row in result]
-
-
 def ensure_manager_note_company_id(db: SQLAlchemy) -> None:
     """Add the company_id column and backfill existing notes."""
 
-    inspector = inspect(db.engine)
+    inspector = inspect(db.session.connection())
     columns = {col['name'] for col in inspector.get_columns('manager_note')}
 
     if 'company_id' not in columns:
@@ -26,48 +17,35 @@ def ensure_manager_note_company_id(db: SQLAlchemy) -> None:
         db.session.execute(
             text('CREATE INDEX IF NOT EXISTS ix_manager_note_company_id ON manager_note (company_id)')
         )
-        db.session.commit()
 
-    notes_without_company: Sequence = db.session.execute(
-        text(
-            'SELECT id, periodo_inicio, periodo_fim, conteudo, author_id '
-            'FROM manager_note WHERE company_id IS NULL'
-        )
-    ).fetchall()
-
-    if not notes_without_company:
+    has_unassigned_notes = db.session.execute(
+        text('SELECT 1 FROM manager_note WHERE company_id IS NULL LIMIT 1')
+    ).first()
+    if not has_unassigned_notes:
         return
 
-    company_ids = _fetch_company_ids(db)
-    if not company_ids:
+    primary_company_id = db.session.execute(
+        text("SELECT MIN(id) FROM user WHERE role = 'user'")
+    ).scalar()
+    if primary_company_id is None:
         # Without companies we cannot meaningfully backfill the data.
         return
 
-    primary_company_id = company_ids[0]
-
-    for note in notes_without_company:
-        note_data = note._mapping if hasattr(note, '_mapping') else note
-        db.session.execute(
-            text(
-                'UPDATE manager_note SET company_id = :company_id WHERE id = :note_id'
-            ),
-            {'company_id': primary_company_id, 'note_id': note_data['id']},
-        )
-
-        for company_id in company_ids[1:]:
-            db.session.execute(
-                text(
-                    'INSERT INTO manager_note '
-                    '(periodo_inicio, periodo_fim, conteudo, author_id, company_id) '
-                    'VALUES (:inicio, :fim, :conteudo, :author_id, :company_id)'
-                ),
-                {
-                    'inicio': note_data['periodo_inicio'],
-                    'fim': note_data['periodo_fim'],
-                    'conteudo': note_data['conteudo'],
-                    'author_id': note_data['author_id'],
-                    'company_id': company_id,
-                },
-            )
-
-    db.session.commit()
+    # Set-based backfill: copy each unassigned note to every other company,
+    # then hand the original rows to the first one.
+    db.session.execute(
+        text(
+            'INSERT INTO manager_note '
+            '(periodo_inicio, periodo_fim, conteudo, author_id, company_id) '
+            'SELECT note.periodo_inicio, note.periodo_fim, note.conteudo, note.author_id, company.id '
+            'FROM manager_note AS note '
+            "JOIN user AS company ON company.role = 'user' AND company.id != :primary_company_id "
+            'WHERE note.company_id IS NULL '
+            'ORDER BY note.id, company.id'
+        ),
+        {'primary_company_id': primary_company_id},
+    )
+    db.session.execute(
+        text('UPDATE manager_note SET company_id = :company_id WHERE company_id IS NULL'),
+        {'company_id': primary_company_id},
+    )
@@ -0,0 +1,49 @@
+"""Collapse duplicate manager notes before their unique indexes are created."""
+
+import logging
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+
+logger = logging.getLogger(__name__)
+
+BACKUP_TABLE = 'manager_note_duplicate_backup'
+
+_DUPLICATES = (
+    'FROM manager_note WHERE id NOT IN ('
+    'SELECT MAX(id) FROM manager_note '
+    'GROUP BY author_id, periodo_inicio, periodo_fim, company_id)'
+)
+
+
+def collapse_duplicate_manager_notes(db: SQLAlchemy) -> None:
+    """
+    Keep only the most recent note per (author, period, company), which is the
+    one the dashboards already show. Removed rows are copied to
+    manager_note_duplicate_backup first and the count is logged.
+    """
+
+    duplicates = db.session.execute(text(f'SELECT COUNT(*) {_DUPLICATES}')).scalar()
+    if not duplicates:
+        return
+
+    db.session.execute(
+        text(
+            f'CREATE TABLE IF NOT EXISTS {BACKUP_TABLE} ('
+            'id INTEGER, periodo_inicio DATE, periodo_fim DATE, conteudo TEXT, '
+            'author_id INTEGER, company_id INTEGER, archived_at TIMESTAMP)'
+        )
+    )
+    db.session.execute(
+        text(
+            f'INSERT INTO {BACKUP_TABLE} '
+            '(id, periodo_inicio, periodo_fim, conteudo, author_id, company_id, archived_at) '
+            'SELECT id, periodo_inicio, periodo_fim, conteudo, author_id, company_id, CURRENT_TIMESTAMP '
+            f'{_DUPLICATES}'
+        )
+    )
+    db.session.execute(text(f'DELETE {_DUPLICATES}'))
+    logger.warning(
+        'Removed %d duplicate manager notes; copies kept in %s', duplicates, BACKUP_TABLE
+    )
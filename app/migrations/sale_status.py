@@ -0,0 +1,31 @@
+"""Rewrite legacy Sale.status_pedido spellings to their canonical values."""
+
+import logging
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_sale_statuses(db: SQLAlchemy) -> None:
+    """
+    Store every status in its normalized form ('pago', 'cancelado', ...).
+    The upload already writes canonical values; rows created before that
+    (e.g. 'Concluído', 'PAGO') are updated once here so the dashboards can
+    filter on status_pedido directly in SQL.
+    """
+
+    from app.services.metrics import _normalize_status
+
+    raw_values = [raw for (raw,) in db.session.execute(text('SELECT DISTINCT status_pedido FROM sale'))]
+    for raw in raw_values:
+        normalized = _normalize_status(raw) if raw is not None else None
+        if normalized is None or normalized == raw:
+            continue
+        updated = db.session.execute(
+            text('UPDATE sale SET status_pedido = :normalized WHERE status_pedido = :raw'),
+            {'normalized': normalized, 'raw': raw},
+        ).rowcount
+        logger.info('Normalized sale status %r to %r on %d rows', raw, normalized, updated)
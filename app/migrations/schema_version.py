@@ -0,0 +1,27 @@
+"""Schema version sentinel that lets startup skip column reflection."""
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+
+SCHEMA_VERSION = 4
+
+
+def get_schema_version(db: SQLAlchemy) -> int:
+    """Return the recorded schema version, or 0 for databases never stamped."""
+
+    db.session.execute(
+        text('CREATE TABLE IF NOT EXISTS app_schema_version (version INTEGER PRIMARY KEY)')
+    )
+    version = db.session.execute(text('SELECT MAX(version) FROM app_schema_version')).scalar()
+    return version or 0
+
+
+def set_schema_version(db: SQLAlchemy, version: int) -> None:
+    """Record ``version`` without committing, so callers can keep it transactional."""
+
+    db.session.execute(text('DELETE FROM app_schema_version'))
+    db.session.execute(
+        text('INSERT INTO app_schema_version (version) VALUES (:version)'),
+        {'version': version},
+    )
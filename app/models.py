@@ -1,4 +1,5 @@
-from datetime import date
+from datetime import date, datetime
+from functools import cached_property
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
@@ -29,9 +30,14 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-    def is_manager(self):
+    @cached_property
+    def _is_manager(self):
+        # A instância vem do user_loader a cada request; o papel não muda nesse intervalo.
         return self.role == 'manager'
 
+    def is_manager(self):
+        return self._is_manager
+
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -51,9 +57,41 @@ class Marketplace(db.Model):
 
 
 class Sale(db.Model):
+    __table_args__ = (
+        db.Index(
+            'ix_sale_mk_data',
+            'marketplace_id',
+            'data_venda',
+            postgresql_include=['valor_total_venda', 'status_pedido'],
+        ),
+        db.Index(
+            'ix_sale_data_mk',
+            'data_venda',
+            'marketplace_id',
+            postgresql_include=['valor_total_venda', 'status_pedido'],
+        ),
+        db.Index(
+            'ix_sale_company_data',
+            'company_id',
+            'data_venda',
+            postgresql_include=['valor_total_venda', 'status_pedido'],
+        ),
+        db.Index(
+            'ix_sale_company_mk_data',
+            'company_id',
+            'marketplace_id',
+            'data_venda',
+            postgresql_include=['valor_total_venda', 'status_pedido'],
+        ),
+        # Deduplicação da importação: a mesma linha não entra duas vezes no marketplace
+        db.Index('ux_sale_mk_hash', 'marketplace_id', 'sale_hash', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    marketplace_id = db.Column(db.Integer, db.ForeignKey('marketplace.id'), nullable=False, index=True)
-    company_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    # marketplace_id e company_id lideram índices compostos acima;
+    # índices próprios de uma coluna seriam redundantes.
+    marketplace_id = db.Column(db.Integer, db.ForeignKey('marketplace.id'), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
     # Colunas originais
     nome_produto = db.Column(db.String(255), nullable=False)
@@ -97,11 +135,70 @@ class Sale(db.Model):
     margem_percentual = db.Column(db.Numeric(5, 2), nullable=True)
     faixa_preco = db.Column(db.String(50), nullable=True)
 
+    # Hash blake2b (16 bytes) da linha importada; nulo para vendas cadastradas fora do CSV
+    sale_hash = db.Column(db.LargeBinary(16), nullable=True)
+
     def __repr__(self):
         return f'<Sale {self.sku} {self.valor_total_venda}>'
 
 
+# Índices da listagem paginada (ORDER BY data_venda DESC, id DESC), que
+# precisam de colunas ordenadas e por isso ficam fora de __table_args__.
+db.Index(
+    'ix_sale_company_mk_data_desc',
+    Sale.company_id,
+    Sale.marketplace_id,
+    Sale.data_venda.desc(),
+    Sale.id.desc(),
+)
+db.Index(
+    'ix_sale_mk_data_desc',
+    Sale.marketplace_id,
+    Sale.data_venda.desc(),
+    Sale.id.desc(),
+)
+
+
+class CompanyDataBoundary(db.Model):
+    """Datas mínima e máxima de vendas por empresa/marketplace (company_id 0 = sem empresa)."""
+
+    __tablename__ = 'company_data_boundaries'
+
+    company_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    marketplace_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    min_date = db.Column(db.Date, nullable=False)
+    max_date = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f'<CompanyDataBoundary company={self.company_id} '
+            f'marketplace={self.marketplace_id} {self.min_date} - {self.max_date}>'
+        )
+
+
 class ManagerNote(db.Model):
+    __table_args__ = (
+        db.Index(
+            'ux_manager_note_author_periodo',
+            'author_id',
+            'periodo_inicio',
+            'periodo_fim',
+            'company_id',
+            unique=True,
+        ),
+        # NULLs não conflitam no índice acima: notas sem empresa têm o próprio índice parcial.
+        db.Index(
+            'ux_manager_note_author_periodo_no_company',
+            'author_id',
+            'periodo_inicio',
+            'periodo_fim',
+            unique=True,
+            sqlite_where=db.text('company_id IS NULL'),
+            postgresql_where=db.text('company_id IS NULL'),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     periodo_inicio = db.Column(db.Date, nullable=False)
     periodo_fim = db.Column(db.Date, nullable=False)
@@ -0,0 +1,94 @@
+"""Cache em memória das listas de marketplaces e empresas exibidas nos filtros."""
+
+from collections import namedtuple
+from functools import lru_cache
+from typing import Tuple
+
+from flask import g, has_app_context
+from sqlalchemy import event, func, select
+
+from app import db
+from app.models import Marketplace, User
+
+
+MarketplaceOption = namedtuple('MarketplaceOption', 'id nome')
+CompanyOption = namedtuple('CompanyOption', 'id username')
+
+
+def _signature() -> Tuple[int, ...]:
+    """
+    Assinatura (COUNT, MAX(id)) de marketplaces e empresas, obtida em uma
+    única consulta e memorizada em ``g`` durante a requisição.
+    A assinatura muda quando um registro é criado ou removido, o que
+    invalida o cache em todos os workers sem coordenação.
+    """
+    signature = g.get('_bootstrap_signature')
+    if signature is None:
+        row = db.session.execute(
+            select(
+                select(func.count(Marketplace.id)).scalar_subquery(),
+                select(func.max(Marketplace.id)).scalar_subquery(),
+                select(func.count(User.id)).where(User.role == 'user').scalar_subquery(),
+                select(func.max(User.id)).where(User.role == 'user').scalar_subquery(),
+            )
+        ).one()
+        signature = g._bootstrap_signature = tuple(row)
+    return signature
+
+
+@lru_cache(maxsize=1)
+def _cached_marketplaces(signature: Tuple[int, int]) -> Tuple[MarketplaceOption, ...]:
+    rows = (
+        db.session.query(Marketplace.id, Marketplace.nome)
+        .order_by(Marketplace.nome.asc())
+        .all()
+    )
+    return tuple(MarketplaceOption(row.id, row.nome) for row in rows)
+
+
+@lru_cache(maxsize=1)
+def _cached_companies(signature: Tuple[int, int]) -> Tuple[CompanyOption, ...]:
+    rows = (
+        db.session.query(User.id, User.username)
+        .filter(User.role == 'user')
+        .order_by(User.username.asc())
+        .all()
+    )
+    return tuple(CompanyOption(row.id, row.username) for row in rows)
+
+
+def get_bootstrap_signature() -> Tuple[int, ...]:
+    """Assinatura combinada de marketplaces e empresas (útil em chaves de cache)."""
+    return _signature()
+
+
+def get_marketplaces() -> Tuple[MarketplaceOption, ...]:
+    """Retorna os marketplaces ordenados por nome."""
+    return _cached_marketplaces(_signature()[:2])
+
+
+def get_user_companies() -> Tuple[CompanyOption, ...]:
+    """Retorna as empresas (usuários com papel 'user') ordenadas por nome."""
+    return _cached_companies(_signature()[2:])
+
+
+def _reset_signature() -> None:
+    if has_app_context():
+        g.pop('_bootstrap_signature', None)
+
+
+def invalidate_marketplaces() -> None:
+    _cached_marketplaces.cache_clear()
+    _reset_signature()
+
+
+def invalidate_user_companies() -> None:
+    _cached_companies.cache_clear()
+    _reset_signature()
+
+
+# Alterações feitas pelo ORM neste processo (ex.: renomear uma empresa)
+# descartam o cache local imediatamente.
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Marketplace, _event_name, lambda *_: invalidate_marketplaces())
+    event.listen(User, _event_name, lambda *_: invalidate_user_companies())
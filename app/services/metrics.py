@@ -1,18 +1,25 @@
 from decimal import Decimal
+import heapq
 import re
+import time
 import unicodedata
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import desc, func, extract
+from sqlalchemy import Numeric, String, and_, case, cast, event, func, extract, inspect, literal, or_, select, true, union_all
 from sqlalchemy.orm import Session
 
-from app.models import Sale
+from app.models import CompanyDataBoundary, Sale
+from app.utils.sql import dialect_insert
 
 
 VALID_STATUSES = {'pago', 'enviado', 'entregue'}
 CANCELLED_STATUS = 'cancelado'
+BOUNDARIES_TTL_SECONDS = 300
+_BUNDLE_NUMERIC = Numeric(18, 2)
 STATUS_ALIASES = {
     'concluido': 'entregue',
     'concluida': 'entregue',
@@ -47,14 +54,44 @@ def _apply_common_filters(query, start, end, marketplace_id, company_id=None):
     return query
 
 
+# Marcas combinantes dos blocos usados por idiomas latinos, removidas em C por
+# uma única classe de caracteres (str.translate com dict é mais lento aqui).
+_COMBINING_MARKS_RE = re.compile('[%s]' % ''.join(
+    re.escape(chr(codepoint))
+    for block_start, block_end in (
+        (0x0300, 0x0370),
+        (0x1AB0, 0x1B00),
+        (0x1DC0, 0x1E00),
+        (0x20D0, 0x2100),
+        (0xFE20, 0xFE30),
+    )
+    for codepoint in range(block_start, block_end)
+    if unicodedata.combining(chr(codepoint))
+))
+
+
+def _strip_accents(value: str) -> str:
+    if value.isascii():
+        # ASCII não tem decomposição NFKD nem marcas combinantes.
+        return value
+    stripped = _COMBINING_MARKS_RE.sub('', unicodedata.normalize('NFKD', value))
+    if stripped.isascii():
+        return stripped
+    # Texto não latino pode ter marcas de outros blocos.
+    return ''.join(ch for ch in stripped if not unicodedata.combining(ch))
+
+
+# Espaços, hífens e underscores (em sequência) viram um único '_'.
+_STATUS_SEPARATORS_RE = re.compile(r'[ \-_]+')
+
+
+@lru_cache(maxsize=1024)
 def _normalize_status(value: str) -> str:
     if not value:
         return ''
-    normalized = unicodedata.normalize('NFKD', value)
-    normalized = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+    normalized = _strip_accents(value)
     normalized = normalized.lower().strip()
-    normalized = normalized.replace(' ', '_').replace('-', '_')
-    normalized = re.sub(r'_+', '_', normalized)
+    normalized = _STATUS_SEPARATORS_RE.sub('_', normalized)
     normalized = normalized.strip('_')
     return STATUS_ALIASES.get(normalized, normalized)
 
@@ -65,19 +102,56 @@ def get_kpis(
     end,
     marketplace_id: Optional[int] = None,
     company_id: Optional[int] = None,
-) -> Dict[str, float]:
-    base_query = _apply_common_filters(session.query(Sale), start, end, marketplace_id, company_id)
+):
+    """
+    KPIs do período e datas limite do filtro, como (kpis, (min_data, max_data)).
+    As datas vêm na mesma consulta, via LEFT JOIN a partir do subselect de
+    MIN/MAX, para que a rota possa reposicionar um período vazio sem uma ida
+    extra ao banco.
+    """
+    scope = []
+    if marketplace_id:
+        scope.append(Sale.marketplace_id == marketplace_id)
+    if company_id:
+        scope.append(Sale.company_id == company_id)
+    boundaries = (
+        session.query(
+            func.min(Sale.data_venda).label('min_data'),
+            func.max(Sale.data_venda).label('max_data'),
+        )
+        .filter(*scope)
+        .subquery()
+    )
+
+    period = list(scope)
+    if start:
+        period.append(Sale.data_venda >= start)
+    if end:
+        period.append(Sale.data_venda <= end)
 
     rows = (
-        base_query.with_entities(
+        session.query(
+            boundaries.c.min_data,
+            boundaries.c.max_data,
             Sale.status_pedido,
             func.count(Sale.id),
-            func.coalesce(func.sum(Sale.valor_total_venda), 0).label('total')
+            func.coalesce(func.sum(Sale.valor_total_venda), 0),
         )
-        .group_by(Sale.status_pedido)
+        .select_from(boundaries)
+        .outerjoin(Sale, and_(true(), *period))
+        .group_by(boundaries.c.min_data, boundaries.c.max_data, Sale.status_pedido)
         .all()
     )
 
+    min_date, max_date = (rows[0][0], rows[0][1]) if rows else (None, None)
+    _store_boundaries(marketplace_id, company_id, (min_date, max_date))
+    kpis = _summarize_kpis(
+        (status, count, total) for _, _, status, count, total in rows if status is not None
+    )
+    return kpis, (min_date, max_date)
+
+
+def _summarize_kpis(rows) -> Dict[str, float]:
     faturamento_decimal = Decimal(0)
     pedidos_totais = 0
     cancelados = 0
@@ -104,7 +178,17 @@ def get_kpis(
     }
 
 
-def sales_timeseries(
+def _date_label(session: Session, column):
+    """Expressão SQL que formata a data como 'YYYY-MM-DD' no dialeto em uso."""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return func.strftime('%Y-%m-%d', column)
+    if dialect == 'postgresql':
+        return func.to_char(column, 'YYYY-MM-DD')
+    return cast(column, String)
+
+
+def status_breakdown(
     session: Session,
     start,
     end,
@@ -115,32 +199,20 @@ def sales_timeseries(
 
     rows = (
         query.with_entities(
-            Sale.data_venda,
             Sale.status_pedido,
-            func.coalesce(func.sum(Sale.valor_total_venda), 0).label('total')
+            func.count(Sale.id)
         )
-        .group_by(Sale.data_venda, Sale.status_pedido)
-        .order_by(Sale.data_venda.asc())
+        .group_by(Sale.status_pedido)
+        .order_by(func.count(Sale.id).desc())
         .all()
     )
 
-    aggregated: Dict[str, Decimal] = {}
-    for data_venda, status_value, total in rows:
-        normalized = _normalize_status(status_value)
-        if normalized not in VALID_STATUSES:
-            continue
-        total_decimal = total if isinstance(total, Decimal) else Decimal(total or 0)
-        key = data_venda.isoformat()
-        aggregated[key] = aggregated.get(key, Decimal(0)) + total_decimal
-
-    labels = []
+    labels: List[str] = []
     values: List[float] = []
-    for date_key in sorted(aggregated.keys()):
-        labels.append(date_key)
-        total = aggregated[date_key]
-        if isinstance(total, Decimal):
-            total = total.quantize(Decimal('0.01'))
-        values.append(float(total))
+    for status_value, count in rows:
+        normalized = _normalize_status(status_value)
+        labels.append(normalized)
+        values.append(float(count))
 
     return {
         'labels': labels,
@@ -148,35 +220,57 @@ def sales_timeseries(
     }
 
 
-def status_breakdown(
+def status_breakdown_with_previous(
     session: Session,
     start,
     end,
+    previous_start,
+    previous_end,
     marketplace_id: Optional[int] = None,
     company_id: Optional[int] = None,
 ) -> Dict[str, List[float]]:
-    query = _apply_common_filters(session.query(Sale), start, end, marketplace_id, company_id)
+    """
+    Contagem de pedidos por status no período atual e no anterior em uma
+    única consulta. Status equivalentes após a normalização são somados e
+    o resultado vem ordenado pela contagem do período atual.
+    """
+    in_current = Sale.data_venda.between(start, end)
+    in_previous = Sale.data_venda.between(previous_start, previous_end)
+    current_orders = func.count(case((in_current, Sale.id)))
+    previous_orders = func.count(case((in_previous, Sale.id)))
+    # Um único intervalo cobrindo os dois períodos permite um range scan
+    # no índice de data; o CASE separa as contagens de cada período.
+    query = _apply_common_filters(
+        session.query(Sale),
+        min(start, previous_start),
+        max(end, previous_end),
+        marketplace_id,
+        company_id,
+    )
 
     rows = (
-        query.with_entities(
-            Sale.status_pedido,
-            func.count(Sale.id)
-        )
+        query.with_entities(Sale.status_pedido, current_orders, previous_orders)
         .group_by(Sale.status_pedido)
-        .order_by(func.count(Sale.id).desc())
+        .having(or_(current_orders > 0, previous_orders > 0))
+        .order_by(current_orders.desc())
         .all()
     )
 
-    labels: List[str] = []
-    values: List[float] = []
-    for status_value, count in rows:
-        normalized = _normalize_status(status_value)
-        labels.append(normalized)
-        values.append(float(count))
-
+    counts: Dict[str, List[int]] = {}
+    for status_value, current_count, previous_count in rows:
+        totals = counts.setdefault(_normalize_status(status_value), [0, 0])
+        totals[0] += current_count
+        totals[1] += previous_count
+
+    ordered = [
+        (status, float(current), float(previous))
+        for status, (current, previous) in counts.items()
+    ]
+    ordered.sort(key=itemgetter(1), reverse=True)
     return {
-        'labels': labels,
-        'values': values,
+        'labels': [row[0] for row in ordered],
+        'current': [row[1] for row in ordered],
+        'previous': [row[2] for row in ordered],
     }
 
 
@@ -187,69 +281,214 @@ def abc_by_revenue(
     marketplace_id: Optional[int] = None,
     company_id: Optional[int] = None,
     thresholds: Optional[Dict[str, float]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    search: Optional[str] = None,
 ) -> List[Dict[str, float]]:
+    """
+    Curva ABC por SKU. Ranking, participação e acumulado são calculados
+    no banco via window functions; limit/offset paginam o ranking e search
+    filtra SKU ou nome sem alterar a classe calculada sobre o total.
+    """
     thresholds = thresholds or {'A': 0.8, 'B': 0.95}
 
-    query = _apply_common_filters(session.query(Sale), start, end, marketplace_id, company_id)
-
-    rows = (
-        query.with_entities(
-            Sale.sku,
+    per_sku = (
+        _apply_common_filters(session.query(Sale), start, end, marketplace_id, company_id)
+        .filter(Sale.status_pedido.in_(list(VALID_STATUSES)))
+        .with_entities(
+            Sale.sku.label('sku'),
             func.max(Sale.nome_produto).label('nome_produto'),
-            Sale.status_pedido,
-            func.coalesce(func.sum(Sale.valor_total_venda), 0).label('total')
+            func.coalesce(func.sum(Sale.valor_total_venda), 0).label('total'),
         )
-        .group_by(Sale.sku, Sale.status_pedido)
-        .order_by(desc('total'))
-        .all()
+        .group_by(Sale.sku)
+        .subquery()
     )
 
-    aggregated: Dict[str, Dict[str, Decimal]] = {}
-    for sku, nome_produto, status_value, total in rows:
-        normalized = _normalize_status(status_value)
-        if normalized not in VALID_STATUSES:
-            continue
-        total_decimal = total if isinstance(total, Decimal) else Decimal(total or 0)
-        if sku not in aggregated:
-            aggregated[sku] = {
-                'nome_produto': nome_produto,
-                'total': Decimal(0),
-            }
-        aggregated[sku]['total'] += total_decimal
+    ranked = session.query(
+        per_sku.c.sku,
+        per_sku.c.nome_produto,
+        per_sku.c.total,
+        func.sum(per_sku.c.total).over(
+            order_by=(per_sku.c.total.desc(), per_sku.c.sku.asc()), rows=(None, 0)
+        ).label('acumulado'),
+        func.sum(per_sku.c.total).over().label('total_geral'),
+    ).subquery()
+
+    query = session.query(
+        ranked.c.sku,
+        ranked.c.nome_produto,
+        ranked.c.total,
+        ranked.c.acumulado,
+        ranked.c.total_geral,
+    ).order_by(ranked.c.total.desc(), ranked.c.sku.asc())
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(or_(ranked.c.sku.ilike(pattern), ranked.c.nome_produto.ilike(pattern)))
+    if offset:
+        query = query.offset(offset)
+    if limit:
+        query = query.limit(limit)
+
+    return [
+        _abc_entry(sku, nome_produto, total, acumulado_total, total_geral, thresholds)
+        for sku, nome_produto, total, acumulado_total, total_geral in query
+    ]
+
+
+def _abc_entry(sku, nome_produto, total, acumulado_total, total_geral, thresholds) -> Dict[str, float]:
+    total = total if isinstance(total, Decimal) else Decimal(total or 0)
+    total_geral = total_geral if isinstance(total_geral, Decimal) else Decimal(total_geral or 0)
+    if not isinstance(acumulado_total, Decimal):
+        acumulado_total = Decimal(acumulado_total or 0)
+    percentual = (total / total_geral * 100) if total_geral else Decimal(0)
+    acumulado = (acumulado_total / total_geral * 100) if total_geral else Decimal(0)
+
+    classe = 'C'
+    acumulado_ratio = float(acumulado / 100)
+    if acumulado_ratio <= thresholds.get('A', 0.8):
+        classe = 'A'
+    elif acumulado_ratio <= thresholds.get('B', 0.95):
+        classe = 'B'
 
-    sorted_items = sorted(
-        aggregated.items(),
-        key=lambda item: item[1]['total'],
-        reverse=True,
+    return {
+        'sku': sku,
+        'nome_produto': nome_produto,
+        'faturamento': float(total),
+        'percentual': float(percentual),
+        'percentual_acumulado': float(acumulado),
+        'classe': classe,
+    }
+
+
+def get_dashboard_bundle(
+    session: Session,
+    start,
+    end,
+    previous_start,
+    previous_end,
+    marketplace_id: Optional[int] = None,
+    company_id: Optional[int] = None,
+    abc_limit: int = 10,
+) -> Dict:
+    """
+    Reúne em uma única instrução SQL (UNION ALL com coluna discriminadora)
+    os dados do painel principal: KPIs do período atual e anterior, série
+    diária e topo da curva ABC.
+
+    Retorna {'kpis', 'previous_kpis', 'timeseries', 'abc'} nos mesmos
+    formatos de get_kpis e abc_by_revenue.
+    """
+    scope = []
+    if marketplace_id:
+        scope.append(Sale.marketplace_id == marketplace_id)
+    if company_id:
+        scope.append(Sale.company_id == company_id)
+    in_current = Sale.data_venda.between(start, end)
+    in_previous = Sale.data_venda.between(previous_start, previous_end)
+    is_valid = Sale.status_pedido.in_(list(VALID_STATUSES))
+
+    def columns(kind, key=None, nome=None, *values):
+        values = values + (None,) * (4 - len(values))
+        return [
+            literal(kind, String).label('kind'),
+            cast(key, String).label('key'),
+            cast(nome, String).label('nome'),
+        ] + [
+            cast(value, _BUNDLE_NUMERIC).label(f'v{index}')
+            for index, value in enumerate(values)
+        ]
+
+    kpi_rows = (
+        select(*columns(
+            'kpi',
+            Sale.status_pedido,
+            None,
+            func.count(case((in_current, Sale.id))),
+            func.coalesce(func.sum(case((in_current, Sale.valor_total_venda))), 0),
+            func.count(case((in_previous, Sale.id))),
+            func.coalesce(func.sum(case((in_previous, Sale.valor_total_venda))), 0),
+        ))
+        .where(*scope, or_(in_current, in_previous))
+        .group_by(Sale.status_pedido)
     )
 
-    total_revenue = sum(data['total'] for _, data in sorted_items)
-    total_revenue = total_revenue or Decimal(0)
+    timeseries_rows = (
+        select(*columns(
+            'ts',
+            _date_label(session, Sale.data_venda),
+            None,
+            func.round(func.coalesce(func.sum(Sale.valor_total_venda), 0), 2),
+        ))
+        .where(*scope, in_current, is_valid)
+        .group_by(Sale.data_venda)
+    )
+
+    per_sku = (
+        select(
+            Sale.sku.label('sku'),
+            func.max(Sale.nome_produto).label('nome_produto'),
+            func.coalesce(func.sum(Sale.valor_total_venda), 0).label('total'),
+        )
+        .where(*scope, in_current, is_valid)
+        .group_by(Sale.sku)
+        .subquery()
+    )
+    ranking = (per_sku.c.total.desc(), per_sku.c.sku.asc())
+    ranked = (
+        select(
+            per_sku.c.sku,
+            per_sku.c.nome_produto,
+            per_sku.c.total,
+            func.sum(per_sku.c.total).over(order_by=ranking, rows=(None, 0)).label('acumulado'),
+            func.sum(per_sku.c.total).over().label('total_geral'),
+            func.row_number().over(order_by=ranking).label('posicao'),
+        )
+        .order_by(*ranking)
+        .limit(abc_limit)
+        .subquery()
+    )
+    abc_rows = select(*columns(
+        'abc',
+        ranked.c.sku,
+        ranked.c.nome_produto,
+        ranked.c.total,
+        ranked.c.acumulado,
+        ranked.c.total_geral,
+        ranked.c.posicao,
+    ))
+
+    current_rows, previous_rows = [], []
+    timeseries = []
+    abc = []
+    for kind, key, nome, v0, v1, v2, v3 in session.execute(
+        union_all(kpi_rows, timeseries_rows, abc_rows)
+    ):
+        if kind == 'kpi':
+            current_rows.append((key, int(v0), v1))
+            previous_rows.append((key, int(v2), v3))
+        elif kind == 'ts':
+            timeseries.append((key, float(v0)))
+        else:
+            abc.append((v3, key, nome, v0, v1, v2))
+
+    timeseries.sort()
+    abc.sort(key=itemgetter(0))
+    thresholds = {'A': 0.8, 'B': 0.95}
+    return {
+        'kpis': _summarize_kpis(current_rows),
+        'previous_kpis': _summarize_kpis(previous_rows),
+        'timeseries': {
+            'labels': [label for label, _ in timeseries],
+            'values': [value for _, value in timeseries],
+        },
+        'abc': [
+            _abc_entry(sku, nome_produto, total, acumulado, total_geral, thresholds)
+            for _, sku, nome_produto, total, acumulado, total_geral in abc
+        ],
+    }
 
-    acumulado = Decimal(0)
-    resultado = []
-    for sku, data in sorted_items:
-        faturamento_decimal = data['total']
-        percentual = (faturamento_decimal / total_revenue * 100) if total_revenue else Decimal(0)
-        acumulado += percentual
-
-        classe = 'C'
-        acumulado_ratio = float(acumulado / 100)
-        if acumulado_ratio <= thresholds.get('A', 0.8):
-            classe = 'A'
-        elif acumulado_ratio <= thresholds.get('B', 0.95):
-            classe = 'B'
-
-        resultado.append({
-            'sku': sku,
-            'nome_produto': data['nome_produto'],
-            'faturamento': float(faturamento_decimal),
-            'percentual': float(percentual),
-            'percentual_acumulado': float(acumulado),
-            'classe': classe,
-        })
 
-    return resultado
+_boundaries_cache: Dict[Tuple[Optional[int], Optional[int]], Tuple[float, Tuple]] = {}
 
 
 def get_data_boundaries(
@@ -257,15 +496,191 @@ def get_data_boundaries(
     marketplace_id: Optional[int] = None,
     company_id: Optional[int] = None,
 ):
-    query = session.query(func.min(Sale.data_venda), func.max(Sale.data_venda))
+    """
+    Retorna as datas mínima e máxima de vendas para o filtro informado,
+    lidas da tabela resumo company_data_boundaries (ou das vendas, se o resumo
+    ainda não tiver a combinação). O resultado fica em cache por BOUNDARIES_TTL_SECONDS
+    e é descartado por invalidate_data_boundaries() sempre que vendas são gravadas.
+    """
+    cached = _boundaries_cache.get((marketplace_id or None, company_id or None))
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    query = session.query(
+        func.min(CompanyDataBoundary.min_date), func.max(CompanyDataBoundary.max_date)
+    )
     if marketplace_id:
-        query = query.filter(Sale.marketplace_id == marketplace_id)
+        query = query.filter(CompanyDataBoundary.marketplace_id == marketplace_id)
     if company_id:
-        query = query.filter(Sale.company_id == company_id)
+        query = query.filter(CompanyDataBoundary.company_id == company_id)
     min_date, max_date = query.first() or (None, None)
+    if min_date is None:
+        # Sem linha resumo para o filtro: MIN/MAX direto nas vendas, pelo
+        # índice (company_id, marketplace_id, data_venda).
+        live = _apply_common_filters(
+            session.query(func.min(Sale.data_venda), func.max(Sale.data_venda)),
+            None, None, marketplace_id, company_id,
+        )
+        min_date, max_date = live.first() or (None, None)
+    _store_boundaries(marketplace_id, company_id, (min_date, max_date))
     return min_date, max_date
 
 
+def record_data_boundaries(
+    session: Session,
+    marketplace_id: int,
+    company_id: Optional[int],
+    min_date: date,
+    max_date: date,
+) -> None:
+    """
+    Amplia o intervalo de datas registrado para empresa/marketplace após uma
+    importação. Não faz commit: deve rodar na mesma transação das vendas.
+    """
+    values = {
+        'company_id': company_id or 0,
+        'marketplace_id': marketplace_id,
+        'min_date': min_date,
+        'max_date': max_date,
+        'updated_at': datetime.utcnow(),
+    }
+    insert = dialect_insert(session)
+    if insert is not None:
+        if session.get_bind().dialect.name == 'sqlite':
+            lowest, highest = func.min, func.max
+        else:
+            lowest, highest = func.least, func.greatest
+        stmt = insert(CompanyDataBoundary).values(**values)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[CompanyDataBoundary.company_id, CompanyDataBoundary.marketplace_id],
+                set_={
+                    'min_date': lowest(CompanyDataBoundary.min_date, stmt.excluded.min_date),
+                    'max_date': highest(CompanyDataBoundary.max_date, stmt.excluded.max_date),
+                    'updated_at': stmt.excluded.updated_at,
+                },
+            )
+        )
+        return
+
+    boundary = session.get(CompanyDataBoundary, (values['company_id'], marketplace_id))
+    if boundary is None:
+        session.add(CompanyDataBoundary(**values))
+    else:
+        boundary.min_date = min(boundary.min_date, min_date)
+        boundary.max_date = max(boundary.max_date, max_date)
+        boundary.updated_at = values['updated_at']
+
+
+def rebuild_data_boundaries(session: Session) -> None:
+    """Recalcula a tabela de limites a partir das vendas (ex.: após remover uma empresa)."""
+    company_key = func.coalesce(Sale.company_id, 0)
+    session.query(CompanyDataBoundary).delete(synchronize_session=False)
+    session.execute(
+        CompanyDataBoundary.__table__.insert().from_select(
+            ['company_id', 'marketplace_id', 'min_date', 'max_date', 'updated_at'],
+            select(
+                company_key,
+                Sale.marketplace_id,
+                func.min(Sale.data_venda),
+                func.max(Sale.data_venda),
+                func.current_timestamp(),
+            ).group_by(company_key, Sale.marketplace_id),
+        )
+    )
+
+
+def refresh_data_boundaries(session: Session, keys) -> None:
+    """
+    Recalcula as linhas de limites dos pares (company_id, marketplace_id)
+    informados (company_id 0 = sem empresa), usando o índice composto de
+    vendas. Pares que ficaram sem vendas são removidos. Não faz commit.
+    """
+    table = CompanyDataBoundary.__table__
+    connection = session.connection()
+    now = datetime.utcnow()
+    for company_key, marketplace_id in keys:
+        company_filter = Sale.company_id == company_key if company_key else Sale.company_id.is_(None)
+        connection.execute(
+            table.delete().where(
+                table.c.company_id == company_key, table.c.marketplace_id == marketplace_id
+            )
+        )
+        connection.execute(
+            table.insert().from_select(
+                ['company_id', 'marketplace_id', 'min_date', 'max_date', 'updated_at'],
+                select(
+                    literal(company_key),
+                    literal(marketplace_id),
+                    func.min(Sale.data_venda),
+                    func.max(Sale.data_venda),
+                    literal(now),
+                )
+                .where(company_filter, Sale.marketplace_id == marketplace_id)
+                .having(func.count(Sale.id) > 0),
+            )
+        )
+
+
+def _changed_boundary_keys(session: Session):
+    """Pares (company_id, marketplace_id) tocados pelas vendas pendentes, inclusive os valores antigos."""
+    keys = set()
+    for sale in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(sale, Sale):
+            continue
+        if sale in session.dirty and not session.is_modified(sale):
+            continue
+        attrs = inspect(sale).attrs
+        companies = {sale.company_id, *attrs.company_id.history.deleted}
+        marketplaces = {sale.marketplace_id, *attrs.marketplace_id.history.deleted}
+        keys.update(
+            (company_id or 0, marketplace_id)
+            for company_id in companies
+            for marketplace_id in marketplaces
+            if marketplace_id is not None
+        )
+    return keys
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_boundary_keys(session, flush_context, instances):
+    # Lido antes do flush: depois dele, vendas removidas não podem mais ser carregadas.
+    keys = _changed_boundary_keys(session)
+    if keys:
+        session.info.setdefault('data_boundary_keys', set()).update(keys)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_boundaries_after_flush(session, flush_context):
+    # Vendas gravadas pelo ORM (fora do upload, que chama record_data_boundaries)
+    # mantêm a tabela resumo na mesma transação.
+    keys = session.info.pop('data_boundary_keys', None)
+    if keys:
+        refresh_data_boundaries(session, sorted(keys))
+        session.info['data_boundaries_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_boundaries_after_commit(session):
+    if session.info.pop('data_boundaries_changed', False):
+        invalidate_data_boundaries()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_boundaries_flag(session):
+    session.info.pop('data_boundary_keys', None)
+    session.info.pop('data_boundaries_changed', None)
+
+
+def _store_boundaries(marketplace_id, company_id, boundaries) -> None:
+    key = (marketplace_id or None, company_id or None)
+    _boundaries_cache[key] = (time.monotonic() + BOUNDARIES_TTL_SECONDS, boundaries)
+
+
+def invalidate_data_boundaries() -> None:
+    _boundaries_cache.clear()
+
+
 def get_most_recent_month_range(
     session: Session,
     marketplace_id: Optional[int] = None,
@@ -877,74 +1292,54 @@ def calculate_rfm_analysis(
     end,
     marketplace_id: Optional[int] = None,
     company_id: Optional[int] = None,
-) -> List[Dict]:
+    limit: Optional[int] = None,
+) -> Tuple[List[Dict], Dict[str, int]]:
     """
     Análise RFM (Recency, Frequency, Monetary) dos clientes.
     Retorna segmentação de clientes baseada em:
     - Recency: dias desde a última compra
     - Frequency: número de compras
     - Monetary: valor total gasto
+
+    Retorna (clientes, contagem_por_segmento). A agregação por comprador é
+    feita no banco; limit restringe apenas a lista de clientes (maiores
+    valores primeiro), a contagem por segmento considera todos.
     """
     query = _apply_common_filters(session.query(Sale), start, end, marketplace_id, company_id)
 
-    # Buscar apenas vendas válidas com comprador identificado
+    # Agregar vendas válidas por cliente identificado
     rows = (
         query.filter(Sale.comprador.isnot(None))
         .filter(Sale.status_pedido.in_(list(VALID_STATUSES)))
         .with_entities(
             Sale.comprador,
-            Sale.data_venda,
-            Sale.valor_total_venda,
+            func.max(Sale.data_venda),
+            func.min(Sale.data_venda),
+            func.count(Sale.id),
+            func.coalesce(func.sum(Sale.valor_total_venda), 0),
         )
+        .group_by(Sale.comprador)
         .all()
     )
 
     if not rows:
-        return []
-
-    # Agrupar por cliente
-    customer_data: Dict[str, Dict] = {}
-    for comprador, data_venda, valor in rows:
-        normalized = _normalize_status(comprador)
-
-        if comprador not in customer_data:
-            customer_data[comprador] = {
-                'last_purchase': data_venda,
-                'first_purchase': data_venda,
-                'purchases': [],
-                'total_value': Decimal(0),
-            }
-
-        customer_data[comprador]['purchases'].append(data_venda)
-        if data_venda > customer_data[comprador]['last_purchase']:
-            customer_data[comprador]['last_purchase'] = data_venda
-        if data_venda < customer_data[comprador]['first_purchase']:
-            customer_data[comprador]['first_purchase'] = data_venda
-
-        valor_decimal = valor if isinstance(valor, Decimal) else Decimal(valor or 0)
-        customer_data[comprador]['total_value'] += valor_decimal
+        return [], {}
 
     # Calcular métricas RFM
     reference_date = end if end else datetime.now().date()
     rfm_data = []
 
-    for comprador, data in customer_data.items():
-        recency = (reference_date - data['last_purchase']).days
-        frequency = len(data['purchases'])
-        monetary = float(data['total_value'].quantize(Decimal('0.01')))
-
+    for comprador, last_purchase, first_purchase, frequency, total_value in rows:
+        total_decimal = total_value if isinstance(total_value, Decimal) else Decimal(total_value or 0)
         rfm_data.append({
             'comprador': comprador,
-            'recency': recency,
+            'recency': (reference_date - last_purchase).days,
             'frequency': frequency,
-            'monetary': monetary,
-            'first_purchase': data['first_purchase'],
-            'last_purchase': data['last_purchase'],
+            'monetary': float(total_decimal.quantize(Decimal('0.01'))),
+            'first_purchase': first_purchase,
+            'last_purchase': last_purchase,
         })
 
-    if not rfm_data:
-        return []
-
     # Calcular quartis para scoring
     recencies = sorted([r['recency'] for r in rfm_data])
     frequencies = sorted([r['frequency'] for r in rfm_data])
@@ -983,6 +1378,7 @@ def calculate_rfm_analysis(
                 return 1
 
     # Calcular scores e segmentos
+    segment_counts: Dict[str, int] = {}
     for customer in rfm_data:
         r_score = get_quartile_score(customer['recency'], recencies, reverse=True)
         f_score = get_quartile_score(customer['frequency'], frequencies)
@@ -1012,11 +1408,18 @@ def calculate_rfm_analysis(
             segment = 'Others'
 
         customer['segment'] = segment
+        segment_counts[segment] = segment_counts.get(segment, 0) + 1
 
     # Ordenar por valor monetário (maiores clientes primeiro)
-    rfm_data.sort(key=lambda x: x['monetary'], reverse=True)
+    def ranking(customer):
+        return (-customer['monetary'], customer['comprador'])
+
+    if limit is not None:
+        rfm_data = heapq.nsmallest(limit, rfm_data, key=ranking)
+    else:
+        rfm_data.sort(key=ranking)
 
-    return rfm_data
+    return rfm_data, segment_counts
 
 
 def cohort_analysis(
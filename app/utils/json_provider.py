@@ -0,0 +1,33 @@
+"""JSON provider backed by orjson, used when the package is installed."""
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serialize with orjson, falling back to Flask's default conversions for
+    types orjson does not handle (Decimal, dates as HTTP dates, __html__).
+    Keys stay sorted so template output matches the default provider.
+    """
+
+    option = (
+        (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        if orjson is not None
+        else 0
+    )
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        # object_hook (usado pela sessão assinada do Flask) só existe no json padrão.
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
@@ -0,0 +1,69 @@
+"""SQL helpers shared across services and view logic."""
+
+from typing import Callable, Iterable, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(session: Session) -> Optional[Callable]:
+    """Return the dialect ``insert`` that supports ON CONFLICT, or None if the backend lacks it."""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def copy_rows(
+    session: Session,
+    table,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    conflict_columns: Optional[Sequence[str]] = None,
+) -> bool:
+    """
+    Bulk-load ``rows`` with ``COPY ... FROM STDIN`` on the session's own
+    connection, so the load commits or rolls back with the session.
+
+    COPY has no ON CONFLICT clause: with ``conflict_columns`` the rows are
+    copied into a temporary staging table and moved with
+    ``INSERT ... SELECT ... ON CONFLICT (conflict_columns) DO NOTHING``, so
+    rows already written by a concurrent load are skipped instead of
+    failing the transaction.
+
+    Only PostgreSQL through psycopg 3 supports this; returns False without
+    touching the database otherwise, and the caller should fall back to an
+    executemany INSERT.
+    """
+    bind = session.get_bind()
+    if bind.dialect.name != 'postgresql' or bind.dialect.driver != 'psycopg':
+        return False
+
+    cursor = session.connection().connection.cursor()
+    preparer = bind.dialect.identifier_preparer
+    target = preparer.format_table(table)
+    column_list = ', '.join(preparer.quote(column) for column in columns)
+    staging = preparer.quote(f'_copy_{table.name}') if conflict_columns else None
+    try:
+        if staging:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS '
+                f'SELECT {column_list} FROM {target} WITH NO DATA'
+            )
+        with cursor.copy(f'COPY {staging or target} ({column_list}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+        if staging:
+            cursor.execute(
+                f'INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging} '
+                'ON CONFLICT ({}) DO NOTHING'.format(
+                    ', '.join(preparer.quote(column) for column in conflict_columns)
+                )
+            )
+            cursor.execute(f'DROP TABLE {staging}')
+    finally:
+        cursor.close()
+    return True
@@ -4,7 +4,10 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///database.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Comporta as consultas paralelas dos dashboards de análise
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': 16}
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'app', 'static', 'uploads', 'logos')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB (increased for CSV uploads)
-    ALLOWED_LOGO_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    ALLOWED_LOGO_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'})
+    AUTO_INIT_DB = os.environ.get('AUTO_INIT_DB', '1').lower() not in ('0', 'false', 'no')